@@ -1,9 +1,17 @@
-import os
-from flask import Flask, request, jsonify, render_template
-from openai import OpenAI
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context
 from dotenv import load_dotenv
+import os
 import json
-from solution_db_utils import add_solution, get_solutions_by_habit, get_all_solutions, extract_solution_from_text
+import time
+from solution_db_utils import (add_solution, get_solutions_by_habit, get_all_solutions, get_indexed_solutions,
+                               find_solutions_in_text, extract_solution_from_text)
+from utils.retrieval import rank_solutions
+from utils.sse import format_sse
+from utils.openai_client import get_client, get_client_stats, record_usage
+from utils.conversation_history import ConversationHistory
+from utils.token_budget import build_prompt, load_tokenizer
+from utils.intent_gate import run_gated
+from utils.data_storage import normalize_user_id
 
 # Load environment variables from .env file
 load_dotenv()
@@ -11,8 +19,11 @@ load_dotenv()
 # Initialize Flask app
 app = Flask(__name__)
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Shared OpenAI client
+client = get_client()
+
+# Fetch the tokenizer now rather than during the first request
+load_tokenizer()
 
 # SFT system prompt
 SFT_SYSTEM_PROMPT = """
@@ -31,8 +42,9 @@ If the user shares a solution that worked for them, acknowledge it and explore h
 Always maintain a positive, hopeful tone and believe in the user's capacity to change.
 """
 
-# Track conversation history
-conversation_history = {}
+# Track conversation history for recently active users; older messages are folded into a running summary
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "50"))
+conversation_history = ConversationHistory("sft", max_messages=HISTORY_MAX_MESSAGES)
 
 
 @app.route("/")
@@ -40,24 +52,13 @@ def index():
     return render_template("index.html")
 
 
-@app.route("/api/chat", methods=["POST"])
-def chat():
-    data = request.json
-    user_message = data.get("message", "")
-    user_id = data.get("user_id", "default_user")  # In a real app, you'd have proper user authentication
-
-    if not user_message:
-        return jsonify({"error": "No message provided"}), 400
-
-    # Initialize conversation history for this user if it doesn't exist
-    if user_id not in conversation_history:
-        conversation_history[user_id] = []
-
+def prepare_chat(user_id, user_message):
+    """Record the user's message, store any solution it contains and build the prompt"""
     # Add user message to conversation history
-    conversation_history[user_id].append({"role": "user", "content": user_message})
+    conversation_history.append(user_id, {"role": "user", "content": user_message})
 
-    # Check if we can extract a solution from the user's message using GPT
-    extracted_solution = extract_solution_from_text(user_message)
+    # Check if we can extract a solution from the user's message using GPT, unless the intent gate rules it out
+    extracted_solution = run_gated("sft_solution", extract_solution_from_text, user_message)
     solution_added = False
     solution_habit = None
 
@@ -73,52 +74,91 @@ def chat():
         solution_habit = extracted_solution["habit"]
         print(f"Solution added: {solution}")
 
+    # Context messages that follow the conversation history
+    context_messages = []
+
+    # If we have relevant solutions for the user's issue, add them as context
+    relevant_solutions = []
+    all_solutions = get_indexed_solutions()
+    if solution_habit:
+        # If we just extracted a solution, look for related solutions
+        relevant_solutions = get_solutions_by_habit(solution_habit)
+    else:
+        # Find solutions for every known habit the user's message mentions, in one pass over the message
+        relevant_solutions = find_solutions_in_text(user_message)
+
+    # Rank by similarity to the message (and effectiveness) rather than taking the first few;
+    # with no habit named, the closest matches from the whole database are used
+    ranked = rank_solutions(
+        all_solutions,
+        user_message,
+        3,
+        allowed_ids={solution["id"] for solution in relevant_solutions} if relevant_solutions else None
+    )
+    if ranked is not None:
+        relevant_solutions = ranked
+
+    if relevant_solutions:
+        solutions_context = "Here are some solutions that have worked in the past for similar issues:\n"
+        for sol in relevant_solutions[:3]:  # Limit to the 3 best matches
+            solutions_context += f"- {sol['description']} (Effectiveness: {sol['effectiveness']})\n"
+        
+        context_messages.append({"role": "system", "content": solutions_context})
+
+    # If we just added a solution, acknowledge it
+    if solution_added:
+        context_messages.append({
+            "role": "system", 
+            "content": f"The user just shared a solution about '{solution_habit}'. Acknowledge it positively and explore how they can apply similar strategies to current challenges."
+        })
+
+    # Prepare messages for OpenAI API, with as much recent conversation history as fits the token budget
+    system_messages = [{"role": "system", "content": SFT_SYSTEM_PROMPT}]
+
+    # Earlier parts of the conversation are represented by their summary
+    summary = conversation_history.summary(user_id)
+    if summary:
+        system_messages.append({"role": "system", "content": f"Summary of the conversation so far: {summary}"})
+
+    messages, prompt_tokens = build_prompt(
+        system_messages,
+        conversation_history.recent(user_id, HISTORY_MAX_MESSAGES),
+        context_messages
+    )
+
+    metadata = {"solution_added": solution_added, "solution_habit": solution_habit, "prompt_tokens": prompt_tokens}
+    return messages, metadata
+
+
+@app.route("/api/chat", methods=["POST"])
+def chat():
+    data = request.json
+    user_message = data.get("message", "")
+    # In a real app, you'd have proper user authentication
     try:
-        # Prepare messages for OpenAI API
-        messages = [
-            {"role": "system", "content": SFT_SYSTEM_PROMPT},
-        ]
-
-        # Add conversation history (limited to last 10 messages to avoid token limits)
-        messages.extend(conversation_history[user_id][-10:])
-
-        # If we have relevant solutions for the user's issue, add them as context
-        relevant_solutions = []
-        if solution_habit:
-            # If we just extracted a solution, look for related solutions
-            relevant_solutions = get_solutions_by_habit(solution_habit)
-        else:
-            # Try to find relevant solutions based on keywords in the user's message
-            all_solutions = get_all_solutions()
-            for solution in all_solutions:
-                if solution["habit"] in user_message.lower():
-                    relevant_solutions.append(solution)
-
-        if relevant_solutions:
-            solutions_context = "Here are some solutions that have worked in the past for similar issues:\n"
-            for sol in relevant_solutions[:3]:  # Limit to 3 most recent solutions
-                solutions_context += f"- {sol['description']} (Effectiveness: {sol['effectiveness']})\n"
-            
-            messages.append({"role": "system", "content": solutions_context})
-
-        # If we just added a solution, acknowledge it
-        if solution_added:
-            messages.append({
-                "role": "system", 
-                "content": f"The user just shared a solution about '{solution_habit}'. Acknowledge it positively and explore how they can apply similar strategies to current challenges."
-            })
+        user_id = normalize_user_id(data.get("user_id", "default_user"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+
+    try:
+        messages, _ = prepare_chat(user_id, user_message)
 
         # Call OpenAI API
+        started = time.monotonic()
         response = client.chat.completions.create(
             model="gpt-4o-mini",
             messages=messages,
         )
+        record_usage(response.usage, time.monotonic() - started)
 
         # Extract the assistant's reply
         assistant_reply = response.choices[0].message.content
 
         # Add assistant's reply to conversation history
-        conversation_history[user_id].append({"role": "assistant", "content": assistant_reply})
+        conversation_history.append(user_id, {"role": "assistant", "content": assistant_reply})
 
         return jsonify({"reply": assistant_reply})
 
@@ -127,6 +167,62 @@ def chat():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/chat/stream", methods=["POST"])
+def chat_stream():
+    """API endpoint that streams the reply as Server-Sent Events"""
+    data = request.json
+    user_message = data.get("message", "")
+    try:
+        user_id = normalize_user_id(data.get("user_id", "default_user"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+
+    def generate():
+        try:
+            messages, metadata = prepare_chat(user_id, user_message)
+            yield format_sse("metadata", metadata)
+
+            started = time.monotonic()
+            stream = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+
+            reply_parts = []
+            for chunk in stream:
+                # The last chunk carries the token usage and no choices
+                if chunk.usage:
+                    record_usage(chunk.usage, time.monotonic() - started)
+                if not chunk.choices:
+                    continue
+
+                token = chunk.choices[0].delta.content
+                if token:
+                    reply_parts.append(token)
+                    yield format_sse("token", token)
+
+            # Add assistant's reply to conversation history
+            assistant_reply = "".join(reply_parts)
+            conversation_history.append(user_id, {"role": "assistant", "content": assistant_reply})
+
+            yield format_sse("done", {"reply": assistant_reply})
+
+        except Exception as e:
+            print(f"Error in chat stream: {str(e)}")
+            yield format_sse("error", {"error": str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.route("/api/solutions", methods=["GET"])
 def get_solutions():
     """API endpoint to get all solutions"""
@@ -134,5 +230,24 @@ def get_solutions():
     return jsonify({"solutions": solutions})
 
 
+@app.route("/api/history", methods=["GET"])
+def get_history():
+    """API endpoint to page through a user's conversation, newest page first"""
+    try:
+        user_id = normalize_user_id(request.args.get("user_id", "default_user"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    before = request.args.get("before", type=int)
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 200)
+    messages, next_before = conversation_history.page(user_id, before_turn=before, limit=limit)
+    return jsonify({"messages": messages, "next_before": next_before})
+
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    """API endpoint for OpenAI request counters and conversation history size"""
+    return jsonify({"openai": get_client_stats(), "conversation_history": conversation_history.stats()})
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5001, debug=True)
@@ -1,9 +1,18 @@
 # app.py
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context
 from dotenv import load_dotenv
 import os
-from utils.chat_controller import process_message
-from utils.data_storage import (load_user_data, update_plan_status)
+from utils.chat_controller import process_message, stream_message, conversation_history
+from utils.sse import format_sse
+from utils.extractors import precompute_plan_candidates
+from utils.openai_client import get_client_stats
+from utils.llm_cache import get_cache_stats
+from utils.local_stage_classifier import get_stage_classifier_stats
+from utils.intent_gate import get_gate_stats
+from utils.response_shaper import get_shaper_stats
+from utils.session_store import SessionStore
+from utils.token_budget import load_tokenizer
+from utils.data_storage import (load_user_data, update_plan_status, user_data_session, normalize_user_id)
 
 # Load environment variables
 load_dotenv()
@@ -11,23 +20,35 @@ load_dotenv()
 # Initialize Flask app
 app = Flask(__name__)
 
+# Fetch the tokenizer now rather than during the first request
+load_tokenizer()
+
 @app.route("/")
 def index():
     return render_template("index.html")
 
-last_assistant_messages = {}
+# Each user's last reply, for recently active users only
+last_assistant_messages = SessionStore()
+
+def remember_assistant_message(user_id, reply):
+    """Store a reply for the user's next turn and start extracting the plans it suggests in the background"""
+    last_assistant_messages[user_id] = reply
+    precompute_plan_candidates(reply, only_if_suggested=True)
 
 @app.route("/api/chat", methods=["POST"])
 def chat():
     data = request.json
     user_message = data.get("message", "")
-    user_id = data.get("user_id", "default_user")
+    try:
+        user_id = normalize_user_id(data.get("user_id", "default_user"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     # Get the last assistant message for this user
     previous_assistant_message = last_assistant_messages.get(user_id)
     
     # Process the message
-    result = process_message(user_message, previous_assistant_message)
+    result = process_message(user_message, previous_assistant_message, user_id)
     
     # Check if result is an error tuple
     if isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], int):
@@ -35,14 +56,72 @@ def chat():
     
     # Store this assistant message for next time
     if "reply" in result:
-        last_assistant_messages[user_id] = result["reply"]
+        remember_assistant_message(user_id, result["reply"])
     
     return jsonify(result)
 
+@app.route("/api/chat/stream", methods=["POST"])
+def chat_stream():
+    data = request.json
+    user_message = data.get("message", "")
+    try:
+        user_id = normalize_user_id(data.get("user_id", "default_user"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+    
+    # Get the last assistant message for this user
+    previous_assistant_message = last_assistant_messages.get(user_id)
+    
+    def generate():
+        for event, payload in stream_message(user_message, previous_assistant_message, user_id):
+            # Store the full assistant message for next time
+            if event == "done":
+                remember_assistant_message(user_id, payload["reply"])
+            yield format_sse(event, payload)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.route("/api/user_data", methods=["GET"])
 def get_user_data_endpoint():
-    user_data = load_user_data()
-    return jsonify(user_data)
+    try:
+        user_id = normalize_user_id(request.args.get("user_id", "default_user"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    with user_data_session(user_id):
+        user_data = load_user_data()
+    # The goal views are derived data kept for prompt building
+    return jsonify({key: value for key, value in user_data.items() if key != "_views"})
+
+@app.route("/api/history", methods=["GET"])
+def get_history():
+    """Page through a user's conversation, newest page first; pass next_before as before for the next page"""
+    try:
+        user_id = normalize_user_id(request.args.get("user_id", "default_user"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    before = request.args.get("before", type=int)
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 200)
+    messages, next_before = conversation_history.page(user_id, before_turn=before, limit=limit)
+    return jsonify({"messages": messages, "next_before": next_before})
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    return jsonify({
+        "openai": get_client_stats(),
+        "llm_cache": get_cache_stats(),
+        "stage_classifier": get_stage_classifier_stats(),
+        "intent_gate": get_gate_stats(),
+        "response_shaper": get_shaper_stats(),
+        "last_assistant_messages": last_assistant_messages.stats(),
+        "conversation_history": conversation_history.stats()
+    })
 
 @app.route("/api/reset_goal", methods=["POST"])
 def reset_goal():
@@ -61,11 +140,16 @@ def update_plan_endpoint():
     data = request.json
     plan_id = data.get("plan_id")
     status = data.get("status")
+    try:
+        user_id = normalize_user_id(data.get("user_id", "default_user"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     if not plan_id or not status:
         return jsonify({"error": "Missing plan_id or status"}), 400
     
-    plan = update_plan_status(plan_id, status)
+    with user_data_session(user_id):
+        plan = update_plan_status(plan_id, status)
     if plan:
         return jsonify({"status": "success", "plan": plan})
     else:
@@ -0,0 +1,132 @@
+# asgi.py
+# ASGI entry point: the chat endpoints run on the async path so one process can keep many
+# conversations in flight while waiting on OpenAI; every other route is served by the Flask app.
+# Run with: uvicorn asgi:app --host 0.0.0.0 --port 5002
+import json
+from asgiref.wsgi import WsgiToAsgi
+
+from app_test import app as flask_app, last_assistant_messages, remember_assistant_message
+from utils.chat_controller import process_message_async, stream_message_async
+from utils.data_storage import normalize_user_id
+from utils.sse import format_sse
+
+flask_asgi = WsgiToAsgi(flask_app)
+
+
+async def read_json(receive):
+    """Read the full request body and parse it as JSON"""
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+
+    return json.loads(body) if body else {}
+
+
+async def send_json(send, data, status=200):
+    """Send a complete JSON response"""
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode())
+        ]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def chat(scope, receive, send):
+    try:
+        data = await read_json(receive)
+    except json.JSONDecodeError:
+        return await send_json(send, {"error": "Invalid JSON"}, 400)
+
+    user_message = data.get("message", "")
+    try:
+        user_id = normalize_user_id(data.get("user_id", "default_user"))
+    except ValueError as e:
+        return await send_json(send, {"error": str(e)}, 400)
+
+    # Get the last assistant message for this user
+    previous_assistant_message = last_assistant_messages.get(user_id)
+
+    # Process the message
+    result = await process_message_async(user_message, previous_assistant_message, user_id)
+
+    # Check if result is an error tuple
+    if isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], int):
+        return await send_json(send, result[0], result[1])
+
+    # Store this assistant message for next time
+    if "reply" in result:
+        remember_assistant_message(user_id, result["reply"])
+
+    await send_json(send, result)
+
+
+async def chat_stream(scope, receive, send):
+    try:
+        data = await read_json(receive)
+    except json.JSONDecodeError:
+        return await send_json(send, {"error": "Invalid JSON"}, 400)
+
+    user_message = data.get("message", "")
+    try:
+        user_id = normalize_user_id(data.get("user_id", "default_user"))
+    except ValueError as e:
+        return await send_json(send, {"error": str(e)}, 400)
+
+    if not user_message:
+        return await send_json(send, {"error": "No message provided"}, 400)
+
+    # Get the last assistant message for this user
+    previous_assistant_message = last_assistant_messages.get(user_id)
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no")
+        ]
+    })
+
+    async for event, payload in stream_message_async(user_message, previous_assistant_message, user_id):
+        # Store the full assistant message for next time
+        if event == "done":
+            remember_assistant_message(user_id, payload["reply"])
+        await send({
+            "type": "http.response.body",
+            "body": format_sse(event, payload).encode("utf-8"),
+            "more_body": True
+        })
+
+    await send({"type": "http.response.body", "body": b""})
+
+
+ASYNC_ROUTES = {
+    "/api/chat": chat,
+    "/api/chat/stream": chat_stream
+}
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        # Nothing to set up or tear down; acknowledge the lifespan events
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in ASYNC_ROUTES:
+        return await ASYNC_ROUTES[scope["path"]](scope, receive, send)
+
+    await flask_asgi(scope, receive, send)
@@ -1,21 +1,54 @@
 import json
 import os
+import re
+import sqlite3
+import threading
 from datetime import datetime
-from openai import OpenAI
 from dotenv import load_dotenv
+from utils.openai_client import get_client
+from utils.llm_cache import cached_completion
+from utils.habit_matcher import HabitMatcher
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Shared OpenAI client
+client = get_client()
 
 # Path to the solutions database file
 DB_PATH = os.path.join(os.path.dirname(__file__), "solutions_db.json")
 
+# Storage engine for solutions: "json" keeps them in DB_PATH, "sqlite" in SQLITE_DB_PATH
+SOLUTIONS_DB_BACKEND = os.getenv("SOLUTIONS_DB_BACKEND", "json")
+SQLITE_DB_PATH = os.path.join(os.path.dirname(__file__), "solutions_db.sqlite3")
+
+# Schema version stored in PRAGMA user_version once the tables exist and the JSON file is migrated
+SQLITE_SCHEMA_VERSION = 1
+
+SOLUTION_COLUMNS = ("id", "name", "habit", "description", "effectiveness", "date_added")
+
+# SQLite connections can't be shared across threads, so each thread opens its own
+_sqlite_local = threading.local()
+_sqlite_setup_lock = threading.Lock()
+
+# In-process copy of the solutions with a habit matcher and habit -> solution IDs postings over it.
+# Solutions added here are appended as they are stored; the database is only read again when
+# another process has written to it (see _sync_solution_index).
+_solution_index = {
+    "signature": None,
+    "solutions": [],
+    "by_id": {},
+    "postings": {},
+    "matcher": HabitMatcher()
+}
+_solution_index_lock = threading.Lock()
+
 
 def load_solutions():
     """Load solutions from the database file"""
+    if SOLUTIONS_DB_BACKEND == "sqlite":
+        return {"solutions": get_all_solutions()}
+
     if not os.path.exists(DB_PATH):
         # Create the file with an empty solutions list if it doesn't exist
         with open(DB_PATH, "w", encoding="utf-8") as f:
@@ -32,44 +65,98 @@ def load_solutions():
 
 def save_solutions(data):
     """Save solutions to the database file"""
+    if SOLUTIONS_DB_BACKEND == "sqlite":
+        conn = _get_sqlite_connection()
+        with conn:
+            conn.execute("DELETE FROM solutions")
+            _insert_solutions(conn, data["solutions"])
+        return
+
     with open(DB_PATH, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=4)
 
 
 def add_solution(name, habit, description, effectiveness):
     """Add a new solution to the database"""
+    date_added = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    if SOLUTIONS_DB_BACKEND == "sqlite":
+        conn = _get_sqlite_connection()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO solutions (name, habit, habit_key, description, effectiveness, date_added) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (name, habit, habit.lower(), description, effectiveness, date_added)
+            )
+        solution = get_solution_by_id(cursor.lastrowid)
+        _index_new_solution(solution)
+        return solution
+
     data = load_solutions()
 
     # Create a new solution entry
     solution = {
-        "id": len(data["solutions"]) + 1,
+        "id": max((s["id"] for s in data["solutions"]), default=0) + 1,
         "name": name,
         "habit": habit,
         "description": description,
         "effectiveness": effectiveness,
-        "date_added": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "date_added": date_added,
     }
 
     # Add the solution to the database
     data["solutions"].append(solution)
     save_solutions(data)
+    _index_new_solution(solution)
     return solution
 
 
 def get_solutions_by_habit(habit):
     """Get all solutions for a specific habit"""
-    data = load_solutions()
-    return [s for s in data["solutions"] if s["habit"].lower() == habit.lower()]
+    if SOLUTIONS_DB_BACKEND == "sqlite":
+        return _query_solutions("WHERE habit_key = ? ORDER BY id", (habit.lower(),))
+
+    # The postings already group the solutions by habit
+    with _solution_index_lock:
+        _sync_solution_index()
+        return [dict(_solution_index["by_id"][solution_id])
+                for solution_id in _solution_index["postings"].get(habit.lower(), [])]
 
 
 def get_all_solutions():
     """Get all solutions from the database"""
+    if SOLUTIONS_DB_BACKEND == "sqlite":
+        return _query_solutions("ORDER BY id")
+
     data = load_solutions()
     return data["solutions"]
 
 
+def get_indexed_solutions():
+    """
+    Get all solutions from the in-process index, oldest first, reading the database only if another process changed it
+    The list is shared, so callers must not modify it.
+    """
+    with _solution_index_lock:
+        _sync_solution_index()
+        return _solution_index["solutions"]
+
+
+def find_solutions_in_text(text):
+    """Get the solutions whose habit is mentioned anywhere in a text, oldest first"""
+    with _solution_index_lock:
+        _sync_solution_index()
+        habits = _solution_index["matcher"].match(text.lower())
+        solution_ids = sorted(solution_id for habit in habits for solution_id in _solution_index["postings"][habit])
+        return [_solution_index["by_id"][solution_id] for solution_id in solution_ids]
+
+
 def get_solution_by_id(solution_id):
     """Get a specific solution by its ID"""
+    if SOLUTIONS_DB_BACKEND == "sqlite":
+        solutions = _query_solutions("WHERE id = ?", (solution_id,))
+        return solutions[0] if solutions else None
+
     data = load_solutions()
     for solution in data["solutions"]:
         if solution["id"] == solution_id:
@@ -77,6 +164,194 @@ def get_solution_by_id(solution_id):
     return None
 
 
+def search_solutions(query, limit=10):
+    """Get the solutions whose descriptions best match a free-text query"""
+    words = re.findall(r"\w+", query.lower())
+    if not words:
+        return []
+
+    if SOLUTIONS_DB_BACKEND == "sqlite":
+        # Quote each word so user text is never parsed as FTS query syntax
+        match = " OR ".join(f'"{word}"' for word in words)
+        return _query_solutions(
+            "JOIN solutions_fts ON solutions_fts.rowid = solutions.id "
+            "WHERE solutions_fts MATCH ? ORDER BY solutions_fts.rank LIMIT ?",
+            (match, limit)
+        )
+
+    scored = []
+    for solution in get_all_solutions():
+        description = solution["description"].lower()
+        score = sum(1 for word in words if word in description)
+        if score:
+            scored.append((score, solution))
+    scored.sort(key=lambda item: -item[0])
+    return [solution for _, solution in scored[:limit]]
+
+
+def _solutions_signature():
+    """Return a cheap fingerprint of the stored solutions that changes whenever any process writes them"""
+    if SOLUTIONS_DB_BACKEND == "sqlite":
+        row = _get_sqlite_connection().execute("SELECT COALESCE(MAX(id), 0), COUNT(*) FROM solutions").fetchone()
+        return ("sqlite", row[0], row[1])
+
+    try:
+        stat = os.stat(DB_PATH)
+    except FileNotFoundError:
+        return ("json", None)
+    return ("json", stat.st_mtime_ns, stat.st_size)
+
+
+def _sync_solution_index():
+    """Catch the in-process index up with the database; call with _solution_index_lock held"""
+    signature = _solutions_signature()
+    if signature == _solution_index["signature"]:
+        return
+
+    solutions = _solution_index["solutions"]
+    last_id = solutions[-1]["id"] if solutions else 0
+    if SOLUTIONS_DB_BACKEND == "sqlite" and _solution_index["signature"] is not None:
+        # Rows are only ever inserted, so the ones after the last indexed ID are the new ones
+        added = _query_solutions("WHERE id > ? ORDER BY id", (last_id,))
+        if len(solutions) + len(added) == signature[2]:
+            for solution in added:
+                _add_to_index(solution)
+            _solution_index["signature"] = signature
+            return
+    stored = get_all_solutions()
+
+    if [s["id"] for s in stored[:len(solutions)]] != [s["id"] for s in solutions]:
+        # The stored list was rewritten rather than appended to
+        _solution_index.update(solutions=[], by_id={}, postings={}, matcher=HabitMatcher())
+        solutions = _solution_index["solutions"]
+
+    for solution in stored[len(solutions):]:
+        _add_to_index(solution)
+    _solution_index["signature"] = signature
+
+
+def _index_new_solution(solution):
+    """Add a solution this process just stored, without reading the database back"""
+    with _solution_index_lock:
+        solutions = _solution_index["solutions"]
+        previous = _solution_index["signature"]
+        if previous is None or (solutions and solutions[-1]["id"] >= solution["id"]):
+            return
+
+        _add_to_index(solution)
+        signature = _solutions_signature()
+        # Only skip the next read if nobody else wrote in between
+        if SOLUTIONS_DB_BACKEND == "sqlite" and signature[2] != len(solutions):
+            return
+        _solution_index["signature"] = signature
+
+
+def _add_to_index(solution):
+    habit = solution["habit"].lower()
+    _solution_index["solutions"].append(solution)
+    _solution_index["by_id"][solution["id"]] = solution
+    _solution_index["postings"].setdefault(habit, []).append(solution["id"])
+    _solution_index["matcher"].add(habit)
+
+
+def _get_sqlite_connection():
+    """Return this thread's connection to the SQLite solutions database, creating the schema on first use"""
+    conn = getattr(_sqlite_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(SQLITE_DB_PATH, timeout=30)
+        conn.row_factory = sqlite3.Row
+        # WAL lets readers keep going while a solution is being inserted
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _sqlite_setup_lock:
+            _init_sqlite_schema(conn)
+        _sqlite_local.conn = conn
+    return conn
+
+
+def _init_sqlite_schema(conn):
+    """Create the tables and indexes and migrate the JSON file into them, once per database"""
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SQLITE_SCHEMA_VERSION:
+        return
+
+    # Take the write lock first, so only one process creates the schema and migrates
+    conn.execute("BEGIN IMMEDIATE")
+    with conn:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= SQLITE_SCHEMA_VERSION:
+            return
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS solutions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                habit TEXT NOT NULL,
+                habit_key TEXT NOT NULL,
+                description TEXT NOT NULL,
+                effectiveness TEXT,
+                date_added TEXT
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_solutions_habit_key ON solutions (habit_key)")
+
+        # Full-text index over descriptions, kept in sync by the triggers below
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS solutions_fts
+            USING fts5(description, content='solutions', content_rowid='id')
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS solutions_fts_insert AFTER INSERT ON solutions BEGIN
+                INSERT INTO solutions_fts (rowid, description) VALUES (new.id, new.description);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS solutions_fts_delete AFTER DELETE ON solutions BEGIN
+                INSERT INTO solutions_fts (solutions_fts, rowid, description)
+                VALUES ('delete', old.id, old.description);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS solutions_fts_update AFTER UPDATE ON solutions BEGIN
+                INSERT INTO solutions_fts (solutions_fts, rowid, description)
+                VALUES ('delete', old.id, old.description);
+                INSERT INTO solutions_fts (rowid, description) VALUES (new.id, new.description);
+            END
+        """)
+
+        # One-shot migration of the solutions stored so far
+        if os.path.exists(DB_PATH):
+            try:
+                with open(DB_PATH, "r", encoding="utf-8") as f:
+                    _insert_solutions(conn, json.load(f).get("solutions", []))
+            except json.JSONDecodeError:
+                print(f"Error migrating solutions: could not parse {DB_PATH}")
+
+        conn.execute(f"PRAGMA user_version = {SQLITE_SCHEMA_VERSION}")
+
+
+def _insert_solutions(conn, solutions):
+    """Insert solution dictionaries, keeping their IDs unless an earlier row already took the ID"""
+    used_ids = {row[0] for row in conn.execute("SELECT id FROM solutions")}
+    for solution in solutions:
+        # The JSON backend used to reuse IDs, so a repeated ID gets a fresh one
+        solution_id = solution.get("id")
+        if solution_id in used_ids:
+            solution_id = None
+        cursor = conn.execute(
+            "INSERT INTO solutions (id, name, habit, habit_key, description, effectiveness, date_added) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (solution_id, solution["name"], solution["habit"], solution["habit"].lower(),
+             solution["description"], solution.get("effectiveness"), solution.get("date_added"))
+        )
+        used_ids.add(cursor.lastrowid)
+
+
+def _query_solutions(clause, params=()):
+    """Run a SELECT over the solutions table and return the rows as solution dictionaries"""
+    columns = ", ".join(f"solutions.{column}" for column in SOLUTION_COLUMNS)
+    rows = _get_sqlite_connection().execute(f"SELECT {columns} FROM solutions {clause}", params)
+    return [dict(row) for row in rows]
+
+
 def extract_solution_from_text(text):
     """
     Use OpenAI API to determine if the text contains a solution and extract relevant information
@@ -111,17 +386,17 @@ def extract_solution_from_text(text):
         """
 
         # Call OpenAI API to analyze the text
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",  # Use the same model as the main chatbot
-            messages=[
+        content = cached_completion(client, {
+            "model": "gpt-4o-mini",  # Use the same model as the main chatbot
+            "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": f"Analyze this text for solutions: {text}"}
             ],
-            response_format={"type": "json_object"}
-        )
+            "response_format": {"type": "json_object"}
+        })
 
         # Extract the response content
-        result = json.loads(response.choices[0].message.content)
+        result = json.loads(content)
         
         # Check if a solution was identified
         if "is_solution" in result and result["is_solution"] is False:
@@ -30,6 +30,24 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Scroll to the bottom of the chat
         chatMessages.scrollTop = chatMessages.scrollHeight;
+        
+        return messageContent;
+    }
+
+    // Function to parse one Server-Sent Events frame into its event name and JSON data
+    function parseEventFrame(frame) {
+        let event = 'message';
+        let data = '';
+        
+        frame.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                event = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                data += line.slice(5).trim();
+            }
+        });
+        
+        return { event: event, data: data ? JSON.parse(data) : null };
     }
 
     // Function to format solution messages with better styling
@@ -121,8 +139,8 @@ document.addEventListener('DOMContentLoaded', function() {
         showTypingIndicator();
         
         try {
-            // Send message to server
-            const response = await fetch('/api/chat', {
+            // Send message to server and stream the reply back
+            const response = await fetch('/api/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
@@ -133,18 +151,60 @@ document.addEventListener('DOMContentLoaded', function() {
                 })
             });
             
-            const data = await response.json();
+            if (!response.ok || !response.body) {
+                const data = await response.json();
+                removeTypingIndicator();
+                addMessage(`Error: ${data.error || 'Something went wrong'}`, false);
+                return;
+            }
             
-            // Remove typing indicator
-            removeTypingIndicator();
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let reply = '';
+            let replyContent = null;
             
-            if (response.ok) {
-                // Add bot response to chat
-                addMessage(data.reply, false);
-            } else {
-                // Add error message
-                addMessage(`Error: ${data.error || 'Something went wrong'}`, false);
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                
+                buffer += decoder.decode(value, { stream: true });
+                
+                // Frames are separated by a blank line; keep any partial frame in the buffer
+                const frames = buffer.split('\n\n');
+                buffer = frames.pop();
+                
+                for (const frame of frames) {
+                    if (!frame.trim()) continue;
+                    const { event, data } = parseEventFrame(frame);
+                    
+                    if (event === 'token') {
+                        // Replace the typing indicator with the reply on the first token
+                        if (!replyContent) {
+                            removeTypingIndicator();
+                            replyContent = addMessage('', false);
+                        }
+                        reply += data;
+                        replyContent.innerHTML = reply.replace(/\n/g, '<br>');
+                        chatMessages.scrollTop = chatMessages.scrollHeight;
+                    } else if (event === 'done') {
+                        // The finished reply may have been cut down to one question; show that version
+                        if (!replyContent) {
+                            removeTypingIndicator();
+                            replyContent = addMessage('', false);
+                        }
+                        reply = data.reply;
+                        replyContent.innerHTML = reply.replace(/\n/g, '<br>');
+                        chatMessages.scrollTop = chatMessages.scrollHeight;
+                    } else if (event === 'error') {
+                        removeTypingIndicator();
+                        addMessage(`Error: ${data.error || 'Something went wrong'}`, false);
+                    }
+                }
             }
+            
+            // Remove typing indicator
+            removeTypingIndicator();
         } catch (error) {
             // Remove typing indicator
             removeTypingIndicator();
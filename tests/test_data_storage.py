@@ -0,0 +1,63 @@
+# test_data_storage.py
+# Concurrent writers to one user: every commit must survive the version check, the replay of
+# conflicting sessions, the cross-process file lock and log compaction
+import multiprocessing
+import threading
+
+import pytest
+
+import utils.data_storage as data_storage
+
+USER_ID = "concurrent-user"
+
+@pytest.fixture
+def user_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_storage, "USER_DATA_DIR", str(tmp_path))
+    # Compact often, so commits race with snapshot rewrites too
+    monkeypatch.setattr(data_storage, "USER_DATA_SNAPSHOT_EVERY", 7)
+    monkeypatch.setattr(data_storage, "USER_DATA_COMMIT_RETRIES", 1000)
+    with data_storage.user_data_session(USER_ID):
+        data_storage.add_new_goal("walk more")
+    return tmp_path
+
+def _add_plans(worker, count):
+    for i in range(count):
+        # Each session reads the plans to pick the next ID, so a stale one must be replayed
+        with data_storage.user_data_session(USER_ID):
+            data_storage.add_plan(f"task w{worker}i{i}", "daily", "easy")
+
+def _check_plans(expected):
+    with data_storage.user_data_session(USER_ID) as session:
+        data_storage.add_plan("one more task", "daily", "easy")
+    in_memory = session.user_data
+
+    # A fresh load replays the log on top of the last snapshot; it must match what the last writer held
+    replayed, version = data_storage._read_user_data(USER_ID)
+    assert replayed == in_memory
+    assert version == session.version
+
+    plans = replayed["user"]["goals"][0]["plans"]
+    assert sorted(p["action"] for p in plans) == sorted(expected + ["one more task"])
+    assert sorted(p["id"] for p in plans) == list(range(1, len(expected) + 2))
+
+def test_concurrent_threads_lose_no_writes(user_dir):
+    threads = [threading.Thread(target=_add_plans, args=(worker, 20)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    _check_plans([f"task w{worker}i{i}" for worker in range(8) for i in range(20)])
+
+@pytest.mark.skipif(data_storage.fcntl is None or "fork" not in multiprocessing.get_all_start_methods(),
+                    reason="needs fcntl file locks and fork")
+def test_concurrent_processes_lose_no_writes(user_dir):
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_add_plans, args=(worker, 15)) for worker in range(6)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert [process.exitcode for process in processes] == [0] * 6
+    _check_plans([f"task w{worker}i{i}" for worker in range(6) for i in range(15)])
@@ -0,0 +1,29 @@
+# test_goal_views.py
+# Incrementally maintained views must match views built from scratch
+import json
+
+from utils import goal_views
+
+def _same(views, goal):
+    return json.dumps(views, sort_keys=True) == json.dumps(goal_views.build_views(goal), sort_keys=True)
+
+def test_solution_rated_down_makes_room_for_the_next_best():
+    goal = {"solutions": [{"id": i, "description": f"solution {i}", "effectiveness": "high"} for i in range(1, 7)]}
+    views = goal_views.build_views(goal)
+    assert [entry["id"] for entry in views["solutions"]] == [6, 5, 4, 3, 2]
+
+    goal["solutions"][5]["effectiveness"] = "low"
+    goal_views.update_item(views, "solutions", goal["solutions"][5], goal["solutions"])
+
+    assert [entry["id"] for entry in views["solutions"]] == [5, 4, 3, 2, 1]
+    assert _same(views, goal)
+
+def test_repeated_plan_keeps_its_place():
+    goal = {"plans": [{"id": i, "action": f"plan {i}", "timeline": "daily", "status": "active"} for i in range(1, 4)]}
+    views = goal_views.build_views(goal)
+
+    goal["plans"][0]["mentions"] = 2
+    goal_views.update_item(views, "plans", goal["plans"][0], goal["plans"])
+
+    assert [entry["id"] for entry in views["plans"]] == [1, 2, 3]
+    assert _same(views, goal)
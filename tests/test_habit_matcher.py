@@ -0,0 +1,83 @@
+# test_habit_matcher.py
+# The Aho-Corasick matcher must find exactly the habits the substring check it replaced
+# (habit in message.lower()) found
+import random
+
+import pytest
+
+import solution_db_utils
+from utils.habit_matcher import HabitMatcher
+
+def test_overlapping_habits_are_all_found():
+    matcher = HabitMatcher(["he", "she", "his", "hers"])
+    assert matcher.match("ushers") == {"she", "he", "hers"}
+
+    matcher = HabitMatcher(["snacking", "late night snacking", "night", "smoking at night"])
+    assert matcher.match("late night snacking and smoking at night") == {
+        "snacking", "late night snacking", "night", "smoking at night"
+    }
+
+def test_habit_that_is_a_prefix_of_another_is_found_alone():
+    matcher = HabitMatcher(["skip", "skipping breakfast"])
+    assert matcher.match("i keep skipping lunch") == {"skip"}
+
+@pytest.mark.parametrize("text, found", [
+    ("nail biting", {"nail biting"}),
+    ("i hate nail biting.", {"nail biting"}),
+    ("(nail biting)", {"nail biting"}),
+    # Like the substring check, matches don't stop at word boundaries...
+    ("toenail biting", {"nail biting"}),
+    ("running late", {"run"}),
+    # ...but the words of a habit must appear exactly as stored
+    ("nail  biting", set()),
+    ("nail-biting", set()),
+    ("nailbiting", set())
+])
+def test_matches_follow_substring_rules_at_word_boundaries(text, found):
+    assert HabitMatcher(["nail biting", "run"]).match(text) == found
+
+def test_matching_is_case_sensitive():
+    # Callers lowercase both the habits and the text
+    matcher = HabitMatcher(["procrastination"])
+    assert matcher.match("Procrastination") == set()
+    assert matcher.match("Procrastination".lower()) == {"procrastination"}
+
+def test_habits_added_after_matching_are_found():
+    matcher = HabitMatcher(["hers"])
+    assert matcher.match("ushers") == {"hers"}
+
+    # "he" ends inside "hers", so the links built for the first match must be rebuilt
+    assert matcher.add("he")
+    assert matcher.add("she")
+    assert not matcher.add("he")
+    assert not matcher.add("")
+    assert matcher.match("ushers") == {"she", "he", "hers"}
+    assert len(matcher) == 3 and "she" in matcher and "sh" not in matcher
+
+def test_matches_agree_with_substring_search():
+    rng = random.Random(7)
+    for _ in range(200):
+        habits = {"".join(rng.choice("ab ") for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 8))}
+        text = "".join(rng.choice("ab ") for _ in range(rng.randint(0, 30)))
+        matcher = HabitMatcher()
+        for habit in habits:
+            matcher.add(habit)
+            # Interleave matching with adding, so links are rebuilt on a trie that has already been linked
+            matcher.match(text)
+        assert matcher.match(text) == {habit for habit in habits if habit in text}
+
+def test_find_solutions_in_text_ignores_case(tmp_path, monkeypatch):
+    monkeypatch.setattr(solution_db_utils, "SOLUTIONS_DB_BACKEND", "json")
+    monkeypatch.setattr(solution_db_utils, "DB_PATH", str(tmp_path / "solutions_db.json"))
+    monkeypatch.setattr(solution_db_utils, "_solution_index", {
+        "signature": None, "solutions": [], "by_id": {}, "postings": {}, "matcher": HabitMatcher()
+    })
+
+    solution_db_utils.add_solution("Walk after meals", "Late Night Snacking", "Walk after dinner", "high")
+    found = solution_db_utils.find_solutions_in_text("My LATE NIGHT SNACKING is back")
+    assert [s["name"] for s in found] == ["Walk after meals"]
+
+    # A solution added after the index was built is found too
+    solution_db_utils.add_solution("Gum", "nail biting", "Chew gum when stressed", "medium")
+    found = solution_db_utils.find_solutions_in_text("Late night snacking and Nail Biting")
+    assert [s["name"] for s in found] == ["Walk after meals", "Gum"]
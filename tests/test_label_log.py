@@ -0,0 +1,61 @@
+# test_label_log.py
+# Checks that the logs of LLM labels stay bounded and are only written for fresh LLM answers
+import types
+
+import utils.intent_gate as intent_gate
+import utils.llm_cache as llm_cache
+import utils.local_stage_classifier as local_stage_classifier
+import utils.stage_classifier as stage_classifier
+from utils.label_log import append_label, read_labels
+
+def test_log_is_rotated_at_its_cap(tmp_path):
+    path = str(tmp_path / "labels.jsonl")
+    for i in range(100):
+        append_label(path, {"message": f"message {i}"}, 200)
+
+    messages = [record["message"] for record in read_labels(path)]
+    assert (tmp_path / "labels.jsonl").stat().st_size <= 200
+    assert (tmp_path / "labels.jsonl.1").stat().st_size <= 200
+    # Only the newest records are kept, oldest first
+    assert messages == [f"message {i}" for i in range(100 - len(messages), 100)]
+
+def test_zero_cap_turns_logging_off(tmp_path):
+    path = tmp_path / "labels.jsonl"
+    append_label(str(path), {"message": "hello"}, 0)
+    assert not path.exists()
+
+def test_cached_classifications_are_not_logged_again(tmp_path, monkeypatch):
+    calls = []
+
+    def create(**request):
+        calls.append(request)
+        message = types.SimpleNamespace(content="CLASS 4: Action")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+    monkeypatch.setattr(stage_classifier, "client", types.SimpleNamespace(
+        chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create))))
+    monkeypatch.setattr(stage_classifier, "confident_stage", lambda message: None)
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", True)
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(local_stage_classifier, "LOCAL_STAGE_CLASSIFIER_ENABLED", True)
+    monkeypatch.setattr(local_stage_classifier, "STAGE_LABELS_PATH", str(tmp_path / "labels.jsonl"))
+
+    for _ in range(3):
+        assert stage_classifier.classify_stage("I went for a run this morning") == "action"
+
+    assert len(calls) == 1
+    assert local_stage_classifier.load_training_data()[0] == ["I went for a run this morning"]
+    assert len(list(read_labels(str(tmp_path / "labels.jsonl")))) == 1
+
+def test_extractor_outcomes_are_rotated_at_their_cap(tmp_path, monkeypatch):
+    monkeypatch.setattr(intent_gate, "INTENT_GATE_ENABLED", True)
+    monkeypatch.setattr(intent_gate, "INTENT_LABELS_PATH", str(tmp_path / "intent.jsonl"))
+    monkeypatch.setattr(intent_gate, "INTENT_LABELS_MAX_BYTES", 500)
+
+    for i in range(50):
+        intent_gate.record_outcome("plan", f"I will walk {i} minutes", "run", i % 2 == 0)
+
+    messages, found = intent_gate.load_training_data()["plan"]
+    assert 0 < len(messages) < 50
+    assert messages[-1] == "I will walk 49 minutes" and found[-1] is False
+    assert (tmp_path / "intent.jsonl").stat().st_size <= 500
@@ -0,0 +1,55 @@
+# test_near_duplicates.py
+# Regression checks for write-time merging of repeated motivations, plans and solutions
+import pytest
+
+import utils.data_storage as data_storage
+from utils.near_duplicates import DuplicateIndex, ITEM_TEXT
+
+@pytest.fixture
+def user_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_storage, "USER_DATA_DIR", str(tmp_path))
+    with data_storage.user_data_session("dedupe-user"):
+        data_storage.add_new_goal("walk more")
+    return tmp_path
+
+def _find(collection, texts, text):
+    items = [{"id": i + 1, **field} for i, field in enumerate(texts)]
+    index = DuplicateIndex(ITEM_TEXT[collection])
+    index.sync(items)
+    return index.find(items, text)
+
+def test_plans_with_different_amounts_are_kept_apart(user_dir):
+    with data_storage.user_data_session("dedupe-user"):
+        first = data_storage.add_plan("walk 10 min after dinner", "daily", "easy")
+        second = data_storage.add_plan("walk 30 min after dinner", "daily", "medium")
+        plans = data_storage.get_current_goal()["plans"]
+
+    assert first["id"] != second["id"]
+    assert [p["action"] for p in plans] == ["walk 10 min after dinner", "walk 30 min after dinner"]
+    assert "mentions" not in plans[0]
+
+def test_restated_plan_counts_as_a_mention(user_dir):
+    with data_storage.user_data_session("dedupe-user"):
+        data_storage.add_plan("walk every morning", "daily", "easy")
+        data_storage.add_plan("walking every morning", "daily", "easy")
+        plans = data_storage.get_current_goal()["plans"]
+
+    assert len(plans) == 1
+    assert plans[0]["mentions"] == 2
+
+@pytest.mark.parametrize("stored, text", [
+    ("walk 10 min after dinner", "walk 30 min after dinner"),
+    ("go to bed at 10pm", "go to bed at 11pm"),
+    ("walk after lunch", "walk before lunch"),
+    ("stretch in the morning", "stretch in the evening"),
+    ("walk to work", "walk to the gym")
+])
+def test_different_texts_are_not_repeats(stored, text):
+    assert _find("plans", [{"action": stored}], text) is None
+
+@pytest.mark.parametrize("stored, text", [
+    ("wants more energy", "wants to feel more energetic"),
+    ("reading before sleep", "read a book before sleeping")
+])
+def test_rephrased_texts_are_repeats(stored, text):
+    assert _find("motivations", [{"content": stored}], text) is not None
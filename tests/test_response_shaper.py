@@ -0,0 +1,17 @@
+# test_response_shaper.py
+# The local shaper keeps the real question, or leaves the reply to the LLM editor
+from utils.response_shaper import shape_response
+
+def test_trailing_fragment_is_dropped_for_the_real_question():
+    assert shape_response("It's 3 p.m. now. What will you do next? When?") == "It's 3 p.m. now. What will you do next?"
+
+def test_question_opening_with_a_conjunction_is_not_kept():
+    reply = "Walking and stretching are both options. Which one feels doable? Or would you prefer something else?"
+    assert shape_response(reply) == "Walking and stretching are both options. Which one feels doable?"
+
+def test_quoted_question_in_a_statement_is_left_to_the_llm():
+    reply = 'You said "why bother?" last week. What would make it feel worth it? Do you want to try?'
+    assert shape_response(reply) is None
+
+def test_reply_of_dependent_questions_is_left_to_the_llm():
+    assert shape_response("Or maybe tomorrow? And then?") is None
@@ -1,24 +1,66 @@
 # chat_controller.py
 import os
-from openai import OpenAI
+import time
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import json
 
-from utils.stage_classifier import classify_stage
+from utils.stage_classifier import classify_stage, classify_stage_async
 from utils.extractors import (extract_goal_from_text, extract_plan_from_text, 
-                      extract_motivation_from_text, extract_solution_from_text)
+                      extract_motivation_from_text, extract_solution_from_text,
+                      extract_goal_from_text_async, extract_plan_from_text_async,
+                      extract_motivation_from_text_async, extract_solution_from_text_async)
 from utils.data_storage import (load_user_data, get_current_goal, add_new_goal, 
                         set_current_goal, update_goal_stage, add_motivation, 
-                        add_plan, add_solution, get_solutions_for_current_goal,
-                        get_active_plans_for_current_goal, get_motivations_for_current_goal,
-                        get_all_goals)
-from utils.prompt_manager import get_stage_prompt
+                        add_plan, add_solution, get_all_goals, user_data_session, user_data_session_async,
+                        current_user_id, DEFAULT_USER_ID)
+from utils.prompt_manager import get_stage_prompt, get_stage_context
+from utils.turn_analysis import analyze_turn, analyze_turn_async, match_goal_switch
+from utils.openai_client import get_client, get_async_client, record_usage
+from utils.llm_cache import cached_completion, cached_completion_async
+from utils.intent_gate import run_gated, run_gated_async
+from utils.conversation_history import ConversationHistory
+from utils.response_shaper import shape_response
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = get_client()
 
-def process_message(user_message, previous_assistant_message=None):
-    """Process a user message and generate a response"""
+# Per-turn analysis: "sequential" runs the goal-switch check, classifier and extractors one after
+# another, "concurrent" fans them out on a shared thread pool and joins them before prompt assembly,
+# "combined" replaces all of them with a single structured call (see utils/turn_analysis.py)
+ANALYSIS_MODE = os.getenv("TURN_ANALYSIS_MODE", "sequential").lower()
+ANALYSIS_MAX_IN_FLIGHT = int(os.getenv("TURN_ANALYSIS_MAX_IN_FLIGHT", "8"))
+ANALYSIS_CALL_TIMEOUT = float(os.getenv("TURN_ANALYSIS_CALL_TIMEOUT", "15"))
+# The async path holds no thread per call, so it can afford a much higher in-flight limit
+ASYNC_ANALYSIS_MAX_IN_FLIGHT = int(os.getenv("ASYNC_ANALYSIS_MAX_IN_FLIGHT", "256"))
+
+# The prompt carries no raw turns, so every message is folded into the per-user summary once
+# this many have built up
+CONVERSATION_SUMMARY_EVERY = int(os.getenv("CONVERSATION_SUMMARY_EVERY", "6"))
+conversation_history = ConversationHistory("coach", trigger_messages=CONVERSATION_SUMMARY_EVERY, keep_messages=0)
+
+# Replies with several questions are cut down locally; set SIMPLIFY_LLM_FALLBACK=0 to leave the
+# ones the local shaper can't split as they are instead of asking the LLM to simplify them
+SIMPLIFY_LLM_FALLBACK = os.getenv("SIMPLIFY_LLM_FALLBACK", "1") != "0"
+
+_analysis_executor = None
+_analysis_executor_lock = threading.Lock()
+_analysis_semaphore = None
+
+def prepare_turn(user_message, previous_assistant_message=None, user_id=DEFAULT_USER_ID):
+    """
+    Run everything for a user message that comes before the main completion
+    Returns (result, messages): messages is the prompt for the reply, with result holding the
+    reply metadata, or None when the turn is answered directly, with result holding the response
+    """
+    # Scope storage to this user, serve every read this turn from one snapshot and write all changes once at the end
+    with user_data_session(user_id):
+        return _prepare_turn(user_message, previous_assistant_message)
+
+def _prepare_turn(user_message, previous_assistant_message=None):
     if not user_message:
-        return {"error": "No message provided"}, 400
+        return ({"error": "No message provided"}, 400), None
     
     # Load current user data
     user_data = load_user_data()
@@ -28,22 +70,75 @@ def process_message(user_message, previous_assistant_message=None):
     if current_goal is None:
         potential_goal = extract_goal_from_text(user_message)
         if potential_goal:
-            # Create a new goal and set it as current
-            current_goal = add_new_goal(potential_goal)
-            
-            # Greet the user with the new goal
-            greeting_message = f"Thanks for sharing your goal to {potential_goal}. I'm here to support you on this journey. Could you tell me a bit about where you are with this goal right now?"
-            return {
-                "reply": greeting_message,
-                "stage": current_goal["stage"],
-                "previous_stage": current_goal["previous_stage"],
-                "goal": current_goal["name"],
-                "goal_id": current_goal["id"],
-                "goal_detected": True
-            }
+            return _start_new_goal(potential_goal), None
+    
+    # In concurrent and combined modes every per-turn result is fetched up front; results are
+    # applied below in the same order as the sequential path, so persisted data is identical
+    analysis = {}
+    if ANALYSIS_MODE == "concurrent" and current_goal is not None:
+        analysis = analyze_message_concurrently(user_message, previous_assistant_message, current_goal)
+    elif ANALYSIS_MODE == "combined" and current_goal is not None:
+        # One structured call stands in for all five; fall back to the per-call path if it fails
+        analysis = analyze_turn(user_message, previous_assistant_message, get_all_goals()) or {}
+    
+    summary = conversation_history.summary(current_user_id())
+    return _prepare_from_analysis(user_message, previous_assistant_message, current_goal, analysis, summary)
+
+async def prepare_turn_async(user_message, previous_assistant_message=None, user_id=DEFAULT_USER_ID):
+    """Async version of prepare_turn; the per-turn analysis calls always run concurrently"""
+    # Loading and committing the user's data lock files and may retry, so they run off the event loop
+    async with user_data_session_async(user_id):
+        return await _prepare_turn_async(user_message, previous_assistant_message)
+
+async def _prepare_turn_async(user_message, previous_assistant_message=None):
+    if not user_message:
+        return ({"error": "No message provided"}, 400), None
+    
+    current_goal = get_current_goal()
     
+    # If no goal is set yet, try to extract one
+    if current_goal is None:
+        potential_goal = await extract_goal_from_text_async(user_message)
+        if potential_goal:
+            return _start_new_goal(potential_goal), None
+        
+        analysis = {"goal_switch": await check_for_goal_switch_async(user_message)}
+        # With no goal the turn is answered directly, so no summary is needed
+        return _prepare_from_analysis(user_message, previous_assistant_message, current_goal, analysis, None)
+    
+    analysis = None
+    if ANALYSIS_MODE == "combined":
+        analysis = await analyze_turn_async(user_message, previous_assistant_message, get_all_goals())
+    if not analysis:
+        analysis = await analyze_message_async(user_message, previous_assistant_message, current_goal)
+    
+    # The summary is a SQLite read, so it runs off the event loop
+    summary = await asyncio.to_thread(conversation_history.summary, current_user_id())
+    return _prepare_from_analysis(user_message, previous_assistant_message, current_goal, analysis, summary)
+
+def _start_new_goal(potential_goal):
+    """Create a new goal, set it as current and build the greeting response"""
+    # Create a new goal and set it as current
+    current_goal = add_new_goal(potential_goal)
+    
+    # Greet the user with the new goal
+    greeting_message = f"Thanks for sharing your goal to {potential_goal}. I'm here to support you on this journey. Could you tell me a bit about where you are with this goal right now?"
+    return {
+        "reply": greeting_message,
+        "stage": current_goal["stage"],
+        "previous_stage": current_goal["previous_stage"],
+        "goal": current_goal["name"],
+        "goal_id": current_goal["id"],
+        "goal_detected": True
+    }
+
+def _prepare_from_analysis(user_message, previous_assistant_message, current_goal, analysis, summary):
+    """
+    Apply the per-turn analysis results and build the prompt; missing results are fetched sequentially
+    summary is the user's conversation summary, read by the caller so the async path can read it off the event loop.
+    """
     # Check if user wants to switch to a different goal
-    potential_goal_switch = check_for_goal_switch(user_message)
+    potential_goal_switch = _analysis_result(analysis, "goal_switch", check_for_goal_switch, user_message)
     if potential_goal_switch and potential_goal_switch != current_goal["id"]:
         success = set_current_goal(potential_goal_switch)
         if success:
@@ -55,7 +150,7 @@ def process_message(user_message, previous_assistant_message=None):
                 "previous_stage": current_goal["previous_stage"],
                 "goal": current_goal["name"],
                 "goal_id": current_goal["id"]
-            }
+            }, None
     
     # If still no goal, inform the user
     if current_goal is None:
@@ -64,22 +159,24 @@ def process_message(user_message, previous_assistant_message=None):
             "reply": no_goal_message,
             "goal": None,
             "goal_id": None
-        }
+        }, None
     
     # Classify the user's current stage
-    current_stage = classify_stage(user_message)
+    current_stage = _analysis_result(analysis, "stage", classify_stage, user_message)
     
     # Update the goal's stage
     previous_stage = current_goal["stage"]
     current_goal = update_goal_stage(current_stage, previous_stage)
     
-    # Try to extract motivation from the message
-    motivation_content = extract_motivation_from_text(user_message)
+    # Try to extract motivation from the message; the intent gate skips extractors with nothing to find
+    motivation_content = _analysis_result(analysis, "motivation", run_gated, "motivation",
+                                          extract_motivation_from_text, user_message)
     if motivation_content:
         add_motivation(motivation_content, current_stage)
     
     # Try to extract a plan from the message
-    plan = extract_plan_from_text(user_message, previous_assistant_message)
+    plan = _analysis_result(analysis, "plan", run_gated, "plan",
+                            extract_plan_from_text, user_message, previous_assistant_message)
     if plan:
         add_plan(
             plan["action"],
@@ -88,7 +185,8 @@ def process_message(user_message, previous_assistant_message=None):
         )
     
     # Try to extract a solution from the message
-    solution = extract_solution_from_text(user_message)
+    solution = _analysis_result(analysis, "solution", run_gated, "solution",
+                                extract_solution_from_text, user_message)
     if solution:
         add_solution(
             solution["name"],
@@ -97,185 +195,357 @@ def process_message(user_message, previous_assistant_message=None):
         )
 
     
-    # Get the appropriate prompt based on stage
-    stage_prompt = get_stage_prompt(current_stage, {
+    # The static stage prompt goes first, so it is a byte-identical prefix the provider can cache;
+    # everything that changes per user or per turn follows, least volatile first, then the message
+    user_data = {
         "goal": current_goal["name"],
         "previous_stage": previous_stage
-    })
-    
-    stage_prompt = stage_prompt.format(user_message=user_message)
-    
-    # Prepare messages for OpenAI API
+    }
     messages = [
-        {"role": "system", "content": stage_prompt},
-        {"role": "user", "content": user_message}
+        {"role": "system", "content": get_stage_prompt(current_stage, user_data)},
+        {"role": "system", "content": f"The user's goal is: {current_goal['name']}"}
     ]
     
-    # Add goal context
-    messages.insert(1, {
-        "role": "system", 
-        "content": f"The user's goal is: {current_goal['name']}"
-    })
-
-    if current_stage != previous_stage and is_regression(current_stage, previous_stage):
-# Get solutions with special formatting for regression cases
-        solutions = get_solutions_for_current_goal()
-        if solutions:
-            solutions_context = "Previous solutions that worked when you were making more progress include:\n"
-            for sol in solutions[:3]:
-                solutions_context += f"- {sol['description']} (Effectiveness: {sol['effectiveness']})\n"
-            solutions_context += "\nWould you like to revisit any of these approaches, perhaps in a smaller way?"
-            
-            # Insert this special context
-            messages.insert(1, {"role": "system", "content": solutions_context})
+    # Solutions, plans and motivations relevant to the message, deduplicated and packed to CONTEXT_TOKEN_BUDGET
+    stage_context = get_stage_context(current_stage, user_data, user_message)
+    if stage_context:
+        messages.append({"role": "system", "content": stage_context})
+    
+    # Add the summary of earlier turns
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the conversation so far: {summary}"})
+    
+    messages.append({"role": "user", "content": user_message})
+    
+    # Return the reply metadata along with the prompt
+    return {
+        "stage": current_stage,
+        "previous_stage": previous_stage,
+        "goal": current_goal["name"],
+        "goal_id": current_goal["id"]
+    }, messages
 
-    # Add motivational context from past motivations
-    past_motivations = get_motivations_for_current_goal(3)  # Get last 3 motivations
-    if past_motivations:
-        motivations_context = create_motivational_context(past_motivations, current_stage)
-        if motivations_context:
-            messages.insert(1, {"role": "system", "content": motivations_context})
-    
-    # Add active plans as context
-    active_plans = get_active_plans_for_current_goal()
-    if active_plans:
-        plans_context = "Current user plans:\n"
-        for p in active_plans[:2]:  # Limit to 2 most recent active plans
-            plans_context += f"- {p['action']} ({p['timeline']})\n"
-        messages.insert(1, {"role": "system", "content": plans_context})
-    
-    # Add solutions as context
-    solutions = get_solutions_for_current_goal()
-    if solutions:
-        solutions_context = "Solutions that have worked for the user in the past:\n"
-        for sol in solutions[:3]:  # Limit to 3 most recent solutions
-            solutions_context += f"- {sol['description']} (Effectiveness: {sol['effectiveness']})\n"
-        messages.insert(1, {"role": "system", "content": solutions_context})
+def process_message(user_message, previous_assistant_message=None, user_id=DEFAULT_USER_ID):
+    """Process a user message and generate a response"""
+    result, messages = prepare_turn(user_message, previous_assistant_message, user_id)
+    if messages is None:
+        if "reply" in result:
+            remember_turn(user_id, user_message, result["reply"])
+        return result
     
     try:
         # Call OpenAI API
+        started = time.monotonic()
         response = client.chat.completions.create(
             model="gpt-4o-mini",
             messages=messages,
         )
+        record_usage(response.usage, time.monotonic() - started)
         
         # Extract the assistant's reply
         assistant_reply = response.choices[0].message.content
         
         # Simplify the response to avoid multiple questions
         assistant_reply = simplify_response(assistant_reply)
+        remember_turn(user_id, user_message, assistant_reply)
         
         # Return the response along with metadata
-        return {
-            "reply": assistant_reply,
-            "stage": current_stage,
-            "previous_stage": previous_stage,
-            "goal": current_goal["name"],
-            "goal_id": current_goal["id"]
-        }
+        return {"reply": assistant_reply, **result}
     
     except Exception as e:
         print(f"Error in chat endpoint: {str(e)}")
         return {"error": str(e)}, 500
 
-def check_for_goal_switch(user_message):
-    """Check if the user wants to switch to a different goal"""
-    try:
-        all_goals = get_all_goals()
+def stream_message(user_message, previous_assistant_message=None, user_id=DEFAULT_USER_ID):
+    """
+    Process a user message and stream the response as it is generated
+    Yields (event, data) pairs: one "metadata" event with the stage and goal, "token" events with
+    pieces of the reply, then "done" with the full reply, or "error" if the turn failed.
+    The finished reply is passed through simplify_response, and "done" carries that version, which
+    is what gets stored and what the client should show in place of the streamed tokens.
+    """
+    result, messages = prepare_turn(user_message, previous_assistant_message, user_id)
+    
+    if messages is None:
+        # Error tuple from prepare_turn
+        if isinstance(result, tuple):
+            yield "error", result[0]
+            return
         
-        if not all_goals or len(all_goals) <= 1:
-            return None
+        # Direct replies (new goal, goal switch, no goal) are sent as a single token
+        metadata = {key: value for key, value in result.items() if key != "reply"}
+        yield "metadata", metadata
+        yield "token", result["reply"]
+        remember_turn(user_id, user_message, result["reply"])
+        yield "done", {"reply": result["reply"]}
+        return
+    
+    yield "metadata", result
+    
+    try:
+        started = time.monotonic()
+        stream = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
         
-        # Use OpenAI to check if user is requesting a goal switch
-        messages = [
-            {"role": "system", "content": f"The user has the following goals: {', '.join([g['name'] for g in all_goals])}. Determine if the user is asking to switch to one of these goals. If yes, identify which goal they want to switch to. If no, respond with 'NO_SWITCH'."},
-            {"role": "user", "content": user_message}
-        ]
+        reply_parts = []
+        for chunk in stream:
+            # The last chunk carries the token usage and no choices
+            if chunk.usage:
+                record_usage(chunk.usage, time.monotonic() - started)
+            if not chunk.choices:
+                continue
+            
+            token = chunk.choices[0].delta.content
+            if token:
+                reply_parts.append(token)
+                yield "token", token
         
-        response = client.chat.completions.create(
+        # Keep the one-question rule: the shaped reply replaces the streamed one
+        assistant_reply = simplify_response("".join(reply_parts))
+        remember_turn(user_id, user_message, assistant_reply)
+        yield "done", {"reply": assistant_reply}
+    
+    except Exception as e:
+        print(f"Error in chat stream: {str(e)}")
+        yield "error", {"error": str(e)}
+
+async def process_message_async(user_message, previous_assistant_message=None, user_id=DEFAULT_USER_ID):
+    """Async version of process_message"""
+    result, messages = await prepare_turn_async(user_message, previous_assistant_message, user_id)
+    if messages is None:
+        if "reply" in result:
+            await remember_turn_async(user_id, user_message, result["reply"])
+        return result
+    
+    try:
+        started = time.monotonic()
+        response = await get_async_client().chat.completions.create(
             model="gpt-4o-mini",
             messages=messages,
         )
+        record_usage(response.usage, time.monotonic() - started)
         
-        result = response.choices[0].message.content.strip()
+        # Simplify the response to avoid multiple questions
+        assistant_reply = await simplify_response_async(response.choices[0].message.content)
+        await remember_turn_async(user_id, user_message, assistant_reply)
         
-        if result == "NO_SWITCH":
-            return None
+        # Return the response along with metadata
+        return {"reply": assistant_reply, **result}
+    
+    except Exception as e:
+        print(f"Error in chat endpoint: {str(e)}")
+        return {"error": str(e)}, 500
+
+async def stream_message_async(user_message, previous_assistant_message=None, user_id=DEFAULT_USER_ID):
+    """Async version of stream_message"""
+    result, messages = await prepare_turn_async(user_message, previous_assistant_message, user_id)
+    
+    if messages is None:
+        # Error tuple from prepare_turn_async
+        if isinstance(result, tuple):
+            yield "error", result[0]
+            return
         
-        # Find the goal ID that matches the identified goal
-        for goal in all_goals:
-            if goal["name"].lower() in result.lower():
-                return goal["id"]
+        # Direct replies (new goal, goal switch, no goal) are sent as a single token
+        metadata = {key: value for key, value in result.items() if key != "reply"}
+        yield "metadata", metadata
+        yield "token", result["reply"]
+        await remember_turn_async(user_id, user_message, result["reply"])
+        yield "done", {"reply": result["reply"]}
+        return
+    
+    yield "metadata", result
+    
+    try:
+        started = time.monotonic()
+        stream = await get_async_client().chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
         
-        return None
+        reply_parts = []
+        async for chunk in stream:
+            # The last chunk carries the token usage and no choices
+            if chunk.usage:
+                record_usage(chunk.usage, time.monotonic() - started)
+            if not chunk.choices:
+                continue
+            
+            token = chunk.choices[0].delta.content
+            if token:
+                reply_parts.append(token)
+                yield "token", token
+        
+        # Keep the one-question rule: the shaped reply replaces the streamed one
+        assistant_reply = await simplify_response_async("".join(reply_parts))
+        await remember_turn_async(user_id, user_message, assistant_reply)
+        yield "done", {"reply": assistant_reply}
     
     except Exception as e:
-        print(f"Error checking for goal switch: {str(e)}")
-        return None
+        print(f"Error in chat stream: {str(e)}")
+        yield "error", {"error": str(e)}
+
+def remember_turn(user_id, user_message, assistant_reply):
+    """Add a finished turn to the user's conversation history, to be folded into their summary"""
+    conversation_history.append(user_id, {"role": "user", "content": user_message})
+    conversation_history.append(user_id, {"role": "assistant", "content": assistant_reply})
+
+async def remember_turn_async(user_id, user_message, assistant_reply):
+    """Async version of remember_turn; the SQLite writes wait on the database lock, so they run off the event loop"""
+    await asyncio.to_thread(remember_turn, user_id, user_message, assistant_reply)
 
-def create_motivational_context(motivations, current_stage):
-    """Create motivational context based on past motivations and current stage"""
-    if not motivations:
+def _get_analysis_executor():
+    """Return the shared thread pool that bounds in-flight analysis calls across all requests"""
+    global _analysis_executor
+    
+    with _analysis_executor_lock:
+        if _analysis_executor is None:
+            _analysis_executor = ThreadPoolExecutor(
+                max_workers=ANALYSIS_MAX_IN_FLIGHT,
+                thread_name_prefix="turn-analysis"
+            )
+    
+    return _analysis_executor
+
+def _analysis_result(analysis, key, func, *args):
+    """Use a prefetched analysis result if there is one, otherwise make the call now"""
+    if key in analysis:
+        return analysis[key]
+    
+    return func(*args)
+
+def analyze_message_concurrently(user_message, previous_assistant_message, current_goal):
+    """Run goal-switch detection, stage classification and the extractors in parallel
+    
+    Each call gets ANALYSIS_CALL_TIMEOUT seconds from submission. A call that times out
+    falls back to what the sequential path returns on failure (None, or the goal's current
+    stage for the classifier); an exception raised by a call is re-raised as it would be
+    in the sequential path.
+    """
+    calls = {
+        "goal_switch": (check_for_goal_switch, (user_message,), None),
+        "stage": (classify_stage, (user_message,), current_goal["stage"]),
+        "motivation": (run_gated, ("motivation", extract_motivation_from_text, user_message), None),
+        "plan": (run_gated, ("plan", extract_plan_from_text, user_message, previous_assistant_message), None),
+        "solution": (run_gated, ("solution", extract_solution_from_text, user_message), None)
+    }
+    
+    executor = _get_analysis_executor()
+    deadline = time.monotonic() + ANALYSIS_CALL_TIMEOUT
+    futures = {}
+    for key, (func, args, _) in calls.items():
+        # Each task runs in its own copy of the caller's context
+        futures[key] = executor.submit(contextvars.copy_context().run, func, *args)
+    
+    analysis = {}
+    for key, future in futures.items():
+        try:
+            analysis[key] = future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            future.cancel()
+            print(f"Turn analysis call '{key}' timed out after {ANALYSIS_CALL_TIMEOUT}s")
+            analysis[key] = calls[key][2]
+    
+    return analysis
+
+async def analyze_message_async(user_message, previous_assistant_message, current_goal):
+    """Async version of analyze_message_concurrently, bounded by ASYNC_ANALYSIS_MAX_IN_FLIGHT and the same timeout"""
+    calls = {
+        "goal_switch": (check_for_goal_switch_async(user_message), None),
+        "stage": (classify_stage_async(user_message), current_goal["stage"]),
+        "motivation": (run_gated_async("motivation", extract_motivation_from_text_async, user_message), None),
+        "plan": (run_gated_async("plan", extract_plan_from_text_async, user_message, previous_assistant_message), None),
+        "solution": (run_gated_async("solution", extract_solution_from_text_async, user_message), None)
+    }
+    
+    async def run(key, coroutine, default):
+        async with _get_analysis_semaphore():
+            try:
+                return await asyncio.wait_for(coroutine, timeout=ANALYSIS_CALL_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"Turn analysis call '{key}' timed out after {ANALYSIS_CALL_TIMEOUT}s")
+                return default
+    
+    results = await asyncio.gather(*[run(key, coroutine, default) for key, (coroutine, default) in calls.items()])
+    return dict(zip(calls.keys(), results))
+
+def _get_analysis_semaphore():
+    """Return the semaphore that bounds in-flight async analysis calls"""
+    global _analysis_semaphore
+    
+    if _analysis_semaphore is None:
+        _analysis_semaphore = asyncio.Semaphore(ASYNC_ANALYSIS_MAX_IN_FLIGHT)
+    
+    return _analysis_semaphore
+
+def _goal_switch_request(user_message, all_goals):
+    """Build the goal switch detection request"""
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": f"The user has the following goals: {', '.join([g['name'] for g in all_goals])}. Determine if the user is asking to switch to one of these goals. If yes, identify which goal they want to switch to. If no, respond with 'NO_SWITCH'."},
+            {"role": "user", "content": user_message}
+        ]
+    }
+
+def _parse_goal_switch(content, all_goals):
+    """Map a goal switch response to the ID of the goal to switch to, or None"""
+    result = content.strip()
+    
+    if result == "NO_SWITCH":
         return None
     
-    # Organize motivations by stage
-    stage_motivations = {}
-    for m in motivations:
-        if m["stage"] not in stage_motivations:
-            stage_motivations[m["stage"]] = []
-        stage_motivations[m["stage"]].append(m["content"])
-    
-    # Create different contexts based on current stage and stage progression
-    context = "User's expressed motivations:\n"
-    
-    # Add stage-specific context
-    if current_stage == "precontemplation":
-        # For precontemplation, highlight any past motivations from later stages
-        later_stages = ["contemplation", "preparation", "action", "maintenance"]
-        found_later = False
+    # Find the goal ID that matches the identified goal
+    return match_goal_switch(result, all_goals)
+
+def check_for_goal_switch(user_message):
+    """Check if the user wants to switch to a different goal"""
+    try:
+        all_goals = get_all_goals()
         
-        for stage in later_stages:
-            if stage in stage_motivations:
-                found_later = True
-                context += f"When the user was more motivated in the past, they mentioned: {stage_motivations[stage][0]}\n"
-                break
+        if not all_goals or len(all_goals) <= 1:
+            return None
         
-        if not found_later and "precontemplation" in stage_motivations:
-            context += f"The user has expressed: {stage_motivations['precontemplation'][0]}\n"
-    
-    elif current_stage == "contemplation":
-        # For contemplation, highlight reasons for change
-        context += "The user's reasons for considering change include:\n"
-        all_motivations = []
-        for stage, motives in stage_motivations.items():
-            all_motivations.extend(motives)
+        # Use OpenAI to check if user is requesting a goal switch
+        content = cached_completion(client, _goal_switch_request(user_message, all_goals))
         
-        for m in all_motivations[:2]:
-            context += f"- {m}\n"
+        return _parse_goal_switch(content, all_goals)
     
-    elif current_stage in ["preparation", "action"]:
-        # For preparation/action, focus on strongest motivations
-        context += "The user's strongest motivations for change include:\n"
-        priority_stages = ["action", "preparation", "contemplation"]
+    except Exception as e:
+        print(f"Error checking for goal switch: {str(e)}")
+        return None
+
+async def check_for_goal_switch_async(user_message):
+    """Async version of check_for_goal_switch"""
+    try:
+        all_goals = get_all_goals()
         
-        added = 0
-        for stage in priority_stages:
-            if stage in stage_motivations and added < 2:
-                for m in stage_motivations[stage][:2-added]:
-                    context += f"- {m}\n"
-                    added += 1
-    
-    elif current_stage == "maintenance":
-        # For maintenance, remind of progress and initial motivations
-        context += "To help maintain progress, remember the user's original motivations:\n"
-        all_motivations = []
-        for stage, motives in stage_motivations.items():
-            all_motivations.extend(motives)
+        if not all_goals or len(all_goals) <= 1:
+            return None
         
-        if all_motivations:
-            context += f"- {all_motivations[0]}\n"
+        content = await cached_completion_async(get_async_client(), _goal_switch_request(user_message, all_goals))
+        
+        return _parse_goal_switch(content, all_goals)
     
-    return context
+    except Exception as e:
+        print(f"Error checking for goal switch: {str(e)}")
+        return None
+
+def _simplify_request(response_text):
+    """Build the request that reduces a response to a single question"""
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": "You are an editor who simplifies therapeutic responses. Remove all but the most important question, keeping the response to 4-5 sentences total. Maintain the empathetic tone and validation elements."},
+            {"role": "user", "content": f"Simplify this response to contain only ONE question:\n\n{response_text}"}
+        ]
+    }
 
 def simplify_response(response_text):
     """Reduce multiple questions to a single focused question"""
@@ -283,31 +553,22 @@ def simplify_response(response_text):
     question_count = response_text.count('?')
     
     if question_count > 1:
-        # Call OpenAI to simplify
-        messages = [
-            {"role": "system", "content": "You are an editor who simplifies therapeutic responses. Remove all but the most important question, keeping the response to 4-5 sentences total. Maintain the empathetic tone and validation elements."},
-            {"role": "user", "content": f"Simplify this response to contain only ONE question:\n\n{response_text}"}
-        ]
-        
-        simplified = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-        )
-        
-        return simplified.choices[0].message.content
+        shaped = shape_response(response_text)
+        if shaped is not None:
+            return shaped
+        if SIMPLIFY_LLM_FALLBACK:
+            # Call OpenAI to simplify
+            return cached_completion(client, _simplify_request(response_text))
     
     return response_text
 
-def is_regression(current_stage, previous_stage):
-    stages_order = [
-        "precontemplation", 
-        "contemplation", 
-        "preparation", 
-        "action", 
-        "maintenance"
-    ]
+async def simplify_response_async(response_text):
+    """Async version of simplify_response"""
+    if response_text.count('?') > 1:
+        shaped = shape_response(response_text)
+        if shaped is not None:
+            return shaped
+        if SIMPLIFY_LLM_FALLBACK:
+            return await cached_completion_async(get_async_client(), _simplify_request(response_text))
     
-    try:
-        return stages_order.index(current_stage) < stages_order.index(previous_stage)
-    except ValueError:
-        return False
\ No newline at end of file
+    return response_text
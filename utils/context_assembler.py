@@ -0,0 +1,120 @@
+# context_assembler.py
+# Builds the per-user context sent with the stage prompt in one place. The candidate fragments
+# (solutions, active plans, motivations) are the items utils/retrieval.py found most relevant to
+# the message, which rank first, and the current goal's materialized views (utils/goal_views.py),
+# which only hold the newest and best few. Exact repeats are dropped, and the rest are ranked by
+# recency, effectiveness and how well they suit the current stage, then packed into
+# CONTEXT_TOKEN_BUDGET tokens, so no item is sent twice and the context can't grow with the
+# user's history.
+import os
+
+from utils.token_budget import count_tokens
+from utils.goal_views import EFFECTIVENESS_SCORES
+
+# Tokens the assembled context may use, including its section headings and guidance
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+
+# Most items of each kind sent, however much budget is left
+SECTION_LIMITS = {
+    "solutions": 3,
+    "plans": 2,
+    "motivations": 3
+}
+
+SECTION_HEADINGS = {
+    "solutions": "Solutions that have worked for the user in the past:",
+    "plans": "Current plans the user is working on:",
+    "motivations": "Motivations expressed by the user:"
+}
+
+# Motivations voiced in these stages speak most to a user in the key stage: someone who has slipped
+# back is reminded of what moved them when they were further along
+MOTIVATION_STAGE_PRIORITY = {
+    "precontemplation": ["maintenance", "action", "preparation", "contemplation"],
+    "contemplation": ["contemplation", "preparation", "precontemplation"],
+    "preparation": ["action", "preparation", "contemplation"],
+    "action": ["action", "preparation", "contemplation"],
+    "maintenance": ["contemplation", "preparation", "action"]
+}
+
+def assemble_context(views, stage, guidance="", regressed_from=None, regression_guidance="", budget=None, relevant=None):
+    """
+    Return the context for a turn as one block of text built from a goal's views, or "" if there is nothing to send
+    relevant maps a section to (entry, similarity) pairs for the items matching the message, which rank first.
+    guidance is added when any item makes it in; on a regression the stages and
+    regression_guidance always go first and past solutions are ranked higher.
+    """
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+
+    header = ""
+    if regressed_from:
+        header = f"Previous stage: {regressed_from}\nCurrent stage: {stage}\n{regression_guidance}".strip()
+    used = count_tokens(header) + (count_tokens(guidance) if guidance else 0)
+
+    kept = {section: [] for section in SECTION_LIMITS}
+    for fragment in sorted(collect_fragments(views, stage, regressed_from, relevant), key=lambda f: -f["score"]):
+        section = fragment["section"]
+        if len(kept[section]) >= SECTION_LIMITS[section]:
+            continue
+
+        tokens = count_tokens(fragment["text"]) + (0 if kept[section] else count_tokens(SECTION_HEADINGS[section]))
+        if used + tokens > budget:
+            continue
+        kept[section].append(fragment)
+        used += tokens
+
+    blocks = [header] if header else []
+    for section, fragments in kept.items():
+        if fragments:
+            # Oldest first, so the block reads (and caches) the same from turn to turn
+            fragments.sort(key=lambda f: f["id"])
+            blocks.append("\n".join([SECTION_HEADINGS[section]] + [f["text"] for f in fragments]))
+
+    if guidance and any(kept.values()):
+        blocks.append(guidance.strip())
+    return "\n\n".join(blocks)
+
+def collect_fragments(views, stage, regressed_from=None, relevant=None):
+    """Return the relevant entries and those of a goal's views (see goal_views.py) as scored fragments, without repeats"""
+    fragments = []
+
+    # Anything that matches the message outranks what is only recent or effective
+    for section, matches in (relevant or {}).items():
+        for entry, similarity in matches:
+            fragments.append(_fragment(section, entry, 1.0 + similarity))
+
+    solutions = sorted(views["solutions"], key=lambda entry: entry["id"])
+    for position, entry in enumerate(solutions):
+        score = 0.5 * _recency(position, len(solutions)) + 0.5 * EFFECTIVENESS_SCORES.get(entry["effectiveness"], 0.6)
+        # What worked before is the way back after a setback
+        if regressed_from:
+            score += 0.5
+        fragments.append(_fragment("solutions", entry, score))
+
+    plans = views["plans"]
+    for position, entry in enumerate(plans):
+        fragments.append(_fragment("plans", entry, 0.5 + 0.5 * _recency(position, len(plans))))
+
+    motivations = sorted((entry for bucket in views["motivations"].values() for entry in bucket),
+                         key=lambda entry: entry["id"])
+    priority = MOTIVATION_STAGE_PRIORITY.get(stage, [])
+    for position, entry in enumerate(motivations):
+        stage_bonus = 0.0
+        if entry["stage"] in priority:
+            stage_bonus = 0.5 * (len(priority) - priority.index(entry["stage"])) / len(priority)
+        fragments.append(_fragment("motivations", entry, 0.5 * _recency(position, len(motivations)) + stage_bonus))
+
+    # Keep the best-scoring copy of anything stored more than once
+    best = {}
+    for fragment in fragments:
+        key = (fragment["section"], fragment["key"])
+        if key not in best or fragment["score"] > best[key]["score"]:
+            best[key] = fragment
+    return list(best.values())
+
+def _fragment(section, entry, score):
+    return {"section": section, "id": entry["id"], "key": entry["key"], "text": entry["text"], "score": score}
+
+def _recency(position, count):
+    """Score from just above 0 for the oldest item to 1 for the newest"""
+    return (position + 1) / count
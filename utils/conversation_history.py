@@ -0,0 +1,115 @@
+# conversation_history.py
+# Per-user conversation history that stays constant-size: once a user has more than
+# SUMMARY_TRIGGER_MESSAGES unsummarized messages, the oldest are folded into a running summary
+# by a background call, keeping the newest SUMMARY_KEEP_MESSAGES as they are. Prompts then
+# carry the summary plus the recent messages instead of the whole conversation. Messages and
+# summaries live in the conversation store (utils/conversation_store.py), so the full log is
+# kept and every worker sees the same history.
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.openai_client import get_client
+from utils.llm_cache import cached_completion
+from utils.conversation_store import (append_message, get_messages, get_summary, save_summary,
+                                      get_store_stats)
+
+client = get_client()
+
+SUMMARY_TRIGGER_MESSAGES = int(os.getenv("SUMMARY_TRIGGER_MESSAGES", "20"))
+SUMMARY_KEEP_MESSAGES = int(os.getenv("SUMMARY_KEEP_MESSAGES", "10"))
+
+SUMMARY_SYSTEM_PROMPT = """
+You keep a running summary of a conversation between a user and a habit coach.
+Update the existing summary with the new messages. Keep what matters for coaching later on: the user's goals,
+motivations, plans, what has and hasn't worked, setbacks, and anything personal they shared.
+Write in the third person ("The user...") and keep the summary under 200 words.
+Respond with the updated summary only.
+"""
+
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="conversation-summary")
+
+def summarize_messages(previous_summary, messages):
+    """Use OpenAI API to fold messages into a conversation summary"""
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    content = f"Existing summary: {previous_summary or '(none yet)'}\n\nNew messages:\n{transcript}"
+
+    return cached_completion(client, {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": content}
+        ]
+    }).strip()
+
+class ConversationHistory:
+    """Recent messages and a running summary of older ones, per user, kept in the conversation store"""
+
+    def __init__(self, conversation, max_messages=50, trigger_messages=None, keep_messages=None):
+        # Name the messages are logged under, so each bot keeps its own history
+        self.conversation = conversation
+        # Most unsummarized messages sent or folded at once, in case summarizing falls behind or fails
+        self.max_messages = max_messages
+        self.trigger_messages = SUMMARY_TRIGGER_MESSAGES if trigger_messages is None else trigger_messages
+        self.keep_messages = SUMMARY_KEEP_MESSAGES if keep_messages is None else keep_messages
+        # Users with a summary update running in this process
+        self._folding = set()
+        self._lock = threading.Lock()
+
+    def append(self, user_id, message):
+        """Log a message, starting a background summary update if enough have built up"""
+        turn = append_message(self.conversation, user_id, message)
+        _, through_turn = get_summary(self.conversation, user_id)
+        if turn - through_turn <= self.trigger_messages or turn - self.keep_messages <= through_turn:
+            return
+
+        with self._lock:
+            if user_id in self._folding:
+                return
+            self._folding.add(user_id)
+
+        _summary_executor.submit(self._fold, user_id, turn - self.keep_messages)
+
+    def recent(self, user_id, count):
+        """Return up to count of the user's newest messages not yet folded into the summary"""
+        if not count:
+            return []
+        _, through_turn = get_summary(self.conversation, user_id)
+        messages = get_messages(self.conversation, user_id, after_turn=through_turn,
+                                limit=min(count, self.max_messages))
+        return [{"role": m["role"], "content": m["content"]} for m in messages]
+
+    def summary(self, user_id):
+        """Return the summary of the user's older messages, or None if there is none yet"""
+        return get_summary(self.conversation, user_id)[0]
+
+    def page(self, user_id, before_turn=None, limit=50):
+        """
+        Return a page of the user's full history, newest page first
+        Returns (messages, next_before_turn), where next_before_turn is None on the oldest page.
+        """
+        messages = get_messages(self.conversation, user_id, before_turn=before_turn, limit=limit + 1)
+        if len(messages) <= limit:
+            return messages, None
+        messages = messages[1:]
+        return messages, messages[0]["turn"]
+
+    def stats(self):
+        with self._lock:
+            folding = len(self._folding)
+        return {**get_store_stats(self.conversation), "summaries_running": folding}
+
+    def _fold(self, user_id, through_turn):
+        try:
+            previous_summary, summarized_turn = get_summary(self.conversation, user_id)
+            to_fold = get_messages(self.conversation, user_id, after_turn=summarized_turn,
+                                   before_turn=through_turn + 1, limit=self.max_messages)
+            if to_fold:
+                new_summary = summarize_messages(previous_summary, to_fold)
+                if new_summary:
+                    save_summary(self.conversation, user_id, new_summary, through_turn)
+        except Exception as e:
+            print(f"Error summarizing conversation: {str(e)}")
+        finally:
+            with self._lock:
+                self._folding.discard(user_id)
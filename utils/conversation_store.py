@@ -0,0 +1,123 @@
+# conversation_store.py
+# Durable conversation log in SQLite: an append-only table of messages numbered per user, indexed
+# on (conversation, user_id, turn) so the last few turns or any page of history are read without
+# loading the rest, plus each user's running summary. The database is shared by every worker
+# process and survives restarts.
+import os
+import time
+import sqlite3
+import threading
+
+CONVERSATION_DB_PATH = os.getenv("CONVERSATION_DB_PATH", os.path.join(os.path.dirname(__file__), "conversations.sqlite3"))
+
+# Schema version stored in PRAGMA user_version once the tables exist
+SCHEMA_VERSION = 1
+
+_local = threading.local()
+_setup_lock = threading.Lock()
+
+def append_message(conversation, user_id, message):
+    """Add a message to the end of a user's log and return its turn number"""
+    conn = _get_connection()
+    # Take the write lock first, so concurrent writers never pick the same turn number
+    conn.execute("BEGIN IMMEDIATE")
+    with conn:
+        turn = conn.execute(
+            "SELECT COALESCE(MAX(turn), 0) + 1 FROM messages WHERE conversation = ? AND user_id = ?",
+            (conversation, user_id)
+        ).fetchone()[0]
+        conn.execute(
+            "INSERT INTO messages (conversation, user_id, turn, role, content, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (conversation, user_id, turn, message["role"], message["content"], time.time())
+        )
+    return turn
+
+def get_messages(conversation, user_id, after_turn=0, before_turn=None, limit=50):
+    """
+    Return up to limit of a user's newest messages with after_turn < turn < before_turn, oldest first
+    Each message is a dictionary with turn, role, content and created_at.
+    """
+    clause = "conversation = ? AND user_id = ? AND turn > ?"
+    params = [conversation, user_id, after_turn]
+    if before_turn is not None:
+        clause += " AND turn < ?"
+        params.append(before_turn)
+
+    rows = _get_connection().execute(
+        f"SELECT turn, role, content, created_at FROM messages WHERE {clause} ORDER BY turn DESC LIMIT ?",
+        params + [limit]
+    ).fetchall()
+    return [dict(row) for row in reversed(rows)]
+
+def get_summary(conversation, user_id):
+    """Return (summary, through_turn) for a user, or (None, 0) if nothing has been summarized"""
+    row = _get_connection().execute(
+        "SELECT summary, through_turn FROM summaries WHERE conversation = ? AND user_id = ?",
+        (conversation, user_id)
+    ).fetchone()
+    return (row["summary"], row["through_turn"]) if row else (None, 0)
+
+def save_summary(conversation, user_id, summary, through_turn):
+    """Store a summary of a user's messages up to through_turn, unless a later one is already stored"""
+    conn = _get_connection()
+    with conn:
+        conn.execute(
+            "INSERT INTO summaries (conversation, user_id, summary, through_turn) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (conversation, user_id) DO UPDATE SET summary = excluded.summary, "
+            "through_turn = excluded.through_turn WHERE excluded.through_turn > summaries.through_turn",
+            (conversation, user_id, summary, through_turn)
+        )
+
+def get_store_stats(conversation):
+    """Return the number of users and messages logged in a conversation"""
+    row = _get_connection().execute(
+        "SELECT COUNT(DISTINCT user_id) AS users, COUNT(*) AS messages FROM messages WHERE conversation = ?",
+        (conversation,)
+    ).fetchone()
+    return dict(row)
+
+def _get_connection():
+    """Return this thread's connection to the conversation database, creating the schema on first use"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(CONVERSATION_DB_PATH, timeout=30)
+        conn.row_factory = sqlite3.Row
+        # WAL lets readers keep going while another worker appends
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _setup_lock:
+            _init_schema(conn)
+        _local.conn = conn
+    return conn
+
+def _init_schema(conn):
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    with conn:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+
+        # The primary key is the index every read goes through
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                conversation TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                turn INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (conversation, user_id, turn)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                conversation TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                through_turn INTEGER NOT NULL,
+                PRIMARY KEY (conversation, user_id)
+            )
+        """)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
@@ -1,41 +1,459 @@
 # data_storage.py
+# User data is sharded per user: each user has a compacted JSON snapshot plus an append-only log
+# of mutation records. Each mutation appends one compact record to the user's log; loading replays
+# the log on top of the snapshot, and every USER_DATA_SNAPSHOT_EVERY records the log is folded
+# into a new snapshot. Every function works on the user of the active user_data_session.
+#
+# Writes use optimistic concurrency: the sequence number of the last record a session loaded is
+# its version, and its changes are only committed if nobody else has written since. On a conflict
+# the session reloads the user's data and replays its mutator calls on the fresh copy.
 import json
 import os
+import re
+import copy
+import time
+import asyncio
+import zlib
+import hashlib
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager, asynccontextmanager
 from datetime import datetime
 
-# Path to data file
+from utils import goal_views
+from utils.near_duplicates import find_duplicate
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks on this platform: writes are only serialized within one process
+    fcntl = None
+
+# User whose data lives in the original single-user files below
+DEFAULT_USER_ID = "default_user"
+
+# Path to the default user's data file (the snapshot) and its mutation log
 USER_DATA_PATH = os.path.join(os.path.dirname(__file__), "user_data.json")
+USER_DATA_LOG_PATH = os.path.join(os.path.dirname(__file__), "user_data.log")
+
+# Directory holding one snapshot and log per user for every other user
+USER_DATA_DIR = os.path.join(os.path.dirname(__file__), "users")
+
+# Number of log records after which the log is compacted into a new snapshot
+USER_DATA_SNAPSHOT_EVERY = int(os.getenv("USER_DATA_SNAPSHOT_EVERY", "200"))
+
+# How many times a session whose commit conflicts with another writer is replayed before giving up
+USER_DATA_COMMIT_RETRIES = int(os.getenv("USER_DATA_COMMIT_RETRIES", "5"))
+
+# Users hash onto a fixed set of locks, so memory doesn't grow with the number of users ever seen;
+# only users sharing a stripe ever wait on each other
+USER_LOCK_STRIPES = int(os.getenv("USER_LOCK_STRIPES", "64"))
+_user_locks = [threading.Lock() for _ in range(USER_LOCK_STRIPES)]
+
+# The active request-scoped snapshot, if any (see user_data_session)
+_active_session = contextvars.ContextVar("user_data_session", default=None)
+
+def normalize_user_id(user_id):
+    """
+    Return a user ID sent by a client as the string its files are named by
+    Numeric IDs are accepted as their decimal form; None, blank strings and other types raise ValueError.
+    """
+    if isinstance(user_id, bool) or not isinstance(user_id, (str, int)):
+        raise ValueError(f"Invalid user_id: {user_id!r}")
+    user_id = str(user_id)
+    if not user_id.strip():
+        raise ValueError("user_id must not be empty")
+    return user_id
+
+class WriteConflictError(Exception):
+    """Raised when a user's data changed between loading it and committing changes to it"""
+
+class UserDataSession:
+    """Request-scoped snapshot of one user's data, loaded once and written once"""
+
+    def __init__(self, user_id, replay=True):
+        self.user_id = user_id
+        self.replay = replay
+        self.user_data = None
+        self.version = None
+        self.records = []
+        self.replaced = False
+        # Mutator calls made in the session, replayed on fresh data if the commit conflicts
+        self.operations = []
+        self.in_mutation = False
+
+@contextmanager
+def user_data_session(user_id=DEFAULT_USER_ID, replay=True):
+    """
+    Scope every storage call inside the block to one user, serve every load_user_data call
+    from one in-memory snapshot and write all changes in a single write when the block exits
+    Nested sessions for the same user share the outermost snapshot. If another writer committed
+    first, the session's mutator calls are replayed on fresh data, or with replay=False
+    WriteConflictError is raised.
+    """
+    user_id = normalize_user_id(user_id)
+    session = _active_session.get()
+    if session is not None:
+        if session.user_id != user_id:
+            raise ValueError(f"A session for user {session.user_id} is already active")
+        yield session
+        return
+
+    session = UserDataSession(user_id, replay)
+    token = _active_session.set(session)
+    try:
+        yield session
+    finally:
+        # Mutations made before an error are kept, as they would be without a session
+        try:
+            _commit_session(session)
+        finally:
+            _active_session.reset(token)
+
+@asynccontextmanager
+async def user_data_session_async(user_id=DEFAULT_USER_ID, replay=True):
+    """
+    Async version of user_data_session for code running on an event loop: the snapshot is loaded
+    and the changes committed in a worker thread, so file locks and conflict retries (which sleep)
+    never block other requests on the loop
+    """
+    user_id = normalize_user_id(user_id)
+    session = _active_session.get()
+    if session is not None:
+        if session.user_id != user_id:
+            raise ValueError(f"A session for user {session.user_id} is already active")
+        yield session
+        return
+
+    session = UserDataSession(user_id, replay)
+    token = _active_session.set(session)
+    try:
+        session.user_data, session.version = await asyncio.to_thread(_read_user_data, user_id)
+        yield session
+    finally:
+        # to_thread copies the context, so mutator calls replayed after a conflict see this session
+        try:
+            await asyncio.to_thread(_commit_session, session)
+        finally:
+            _active_session.reset(token)
+
+def _mutation(func):
+    """
+    Mark a function as a user data mutator: outside a session each call runs in its own session,
+    and inside one the call is recorded so it can be replayed if the session's commit conflicts
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        session = _active_session.get()
+        if session is None:
+            with user_data_session(DEFAULT_USER_ID):
+                return wrapper(*args, **kwargs)
+
+        if session.in_mutation:
+            # Called from another mutator, which is the call that gets replayed
+            return func(*args, **kwargs)
+
+        session.operations.append((wrapper, args, kwargs))
+        session.in_mutation = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            session.in_mutation = False
+
+    return wrapper
+
+def current_user_id():
+    """Return the user the storage functions currently work on"""
+    session = _active_session.get()
+    return session.user_id if session is not None else DEFAULT_USER_ID
 
 def load_user_data():
-    """Load user data from the database file"""
-    if not os.path.exists(USER_DATA_PATH):
-        # Create default user data structure if it doesn't exist
-        default_user_data = {
-            "user": {
-                "current_goal_id": None,
-                "goals": []
-            }
-        }
-        with open(USER_DATA_PATH, "w", encoding="utf-8") as f:
-            json.dump(default_user_data, f, ensure_ascii=False, indent=4)
-        return default_user_data
+    """Load the current user's data from the database files, or from the active session's snapshot"""
+    session = _active_session.get()
+    if session is None:
+        return _read_user_data(DEFAULT_USER_ID)[0]
+
+    if session.user_data is None:
+        session.user_data, session.version = _read_user_data(session.user_id)
+    return session.user_data
+
+@_mutation
+def save_user_data(user_data):
+    """Replace the current user's whole data document with a new snapshot"""
+    # The views may not match an edited document, so they are rebuilt from it on first read
+    user_data.pop("_views", None)
+    
+    session = _active_session.get()
+    session.user_data = user_data
+    session.replaced = True
+
+def _commit_session(session):
+    """Write a session's changes, replaying its mutator calls on fresh data after a conflict"""
+    for attempt in range(USER_DATA_COMMIT_RETRIES + 1):
+        if not session.replaced and not session.records:
+            return
+
+        try:
+            _write_changes(session)
+            return
+        except WriteConflictError:
+            if not session.replay:
+                raise
+            if attempt == USER_DATA_COMMIT_RETRIES:
+                print(f"Error saving user data for {session.user_id}: still conflicting after {attempt} retries")
+                raise
+
+        # Back off briefly so competing writers do not keep colliding, then redo the work
+        time.sleep(0.01 * (attempt + 1))
+        operations = session.operations
+        session.user_data, session.version = _read_user_data(session.user_id)
+        session.records = []
+        session.replaced = False
+        session.operations = []
+        for func, args, kwargs in operations:
+            func(*args, **kwargs)
 
+def _user_paths(user_id):
+    """Return the snapshot and log paths for a user"""
+    if user_id == DEFAULT_USER_ID:
+        return USER_DATA_PATH, USER_DATA_LOG_PATH
+
+    # User IDs come from clients, so anything that is not a plain token is hashed into a file name
+    if re.fullmatch(r"[A-Za-z0-9_-]{1,64}", user_id):
+        file_name = user_id
+    else:
+        file_name = hashlib.sha256(user_id.encode("utf-8")).hexdigest()
+
+    return (os.path.join(USER_DATA_DIR, f"{file_name}.json"),
+            os.path.join(USER_DATA_DIR, f"{file_name}.log"))
+
+def _user_lock(user_id):
+    """Return the lock guarding a user's files"""
+    # A thread only ever holds one user's lock at a time, so two users sharing a stripe can't deadlock
+    return _user_locks[zlib.crc32(user_id.encode("utf-8")) % USER_LOCK_STRIPES]
+
+@contextmanager
+def _locked_user_files(user_id):
+    """
+    Hold a user's lock across threads and, where supported, across processes
+    Yields the snapshot path, the log path and the open lock file, which stores the
+    log state: the version (sequence number of the last record) and the log's record count.
+    """
+    snapshot_path, log_path = _user_paths(user_id)
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+
+    with _user_lock(user_id):
+        with open(log_path + ".lock", "a+", encoding="utf-8") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield snapshot_path, log_path, lock_file
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _read_log_state(lock_file):
+    lock_file.seek(0)
     try:
-        with open(USER_DATA_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        # If the file is corrupted, return default user data
-        return {
-            "user": {
-                "current_goal_id": None,
-                "goals": []
-            }
+        state = json.loads(lock_file.read())
+        return {"seq": int(state["seq"]), "records": int(state["records"])}
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def _write_log_state(lock_file, state):
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(json.dumps(state))
+    lock_file.flush()
+
+def _default_user_data():
+    return {
+        "user": {
+            "current_goal_id": None,
+            "goals": []
         }
+    }
 
-def save_user_data(user_data):
-    """Save user data to the database file"""
-    with open(USER_DATA_PATH, "w", encoding="utf-8") as f:
-        json.dump(user_data, f, ensure_ascii=False, indent=4)
+def _read_user_data(user_id):
+    """Read a user's snapshot and replay their mutation log on top of it; returns (user_data, version)"""
+    with _locked_user_files(user_id) as (snapshot_path, log_path, lock_file):
+        user_data, state = _read_locked(snapshot_path, log_path)
+        if _read_log_state(lock_file) != state:
+            _write_log_state(lock_file, state)
+        return user_data, state["seq"]
+
+def _read_locked(snapshot_path, log_path):
+    if not os.path.exists(snapshot_path) and not os.path.exists(log_path):
+        # Create default user data structure if it doesn't exist
+        default_user_data = _default_user_data()
+        _write_snapshot_locked(snapshot_path, log_path, default_user_data, 0)
+        return default_user_data, {"seq": 0, "records": 0}
+
+    user_data = _default_user_data()
+    last_seq = 0
+    if os.path.exists(snapshot_path):
+        try:
+            with open(snapshot_path, "r", encoding="utf-8") as f:
+                user_data = json.load(f)
+            last_seq = user_data.pop("_log_seq", 0)
+        except json.JSONDecodeError:
+            # Snapshots are replaced atomically, so this only happens if the file was edited by hand
+            print(f"Could not parse {snapshot_path}, starting from empty user data")
+
+    # Snapshots from before views existed (or replaced by save_user_data) get them built once here;
+    # the snapshot is rewritten below with them, so later loads don't rebuild them from the history
+    views = user_data.setdefault("_views", {})
+    missing_views = [goal for goal in user_data["user"]["goals"] if str(goal["id"]) not in views]
+    for goal in missing_views:
+        views[str(goal["id"])] = goal_views.build_views(goal)
+
+    record_count = 0
+    if os.path.exists(log_path):
+        with open(log_path, "r+b") as f:
+            committed_end = 0
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete record")
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn record from a crash mid-append: it was never committed, so cut
+                    # it off to keep later appends on a clean line
+                    print(f"Discarding incomplete record at the end of {log_path}")
+                    f.truncate(committed_end)
+                    break
+
+                committed_end += len(line)
+                record_count += 1
+                # Records already folded into the snapshot are skipped
+                if record["seq"] > last_seq:
+                    apply_record(user_data, record)
+                    last_seq = record["seq"]
+
+    if missing_views:
+        # Same version, just compacted, so sessions that already loaded it don't conflict
+        _write_snapshot_locked(snapshot_path, log_path, user_data, last_seq)
+        record_count = 0
+
+    return user_data, {"seq": last_seq, "records": record_count}
+
+def _write_changes(session):
+    """
+    Commit a session's changes if the user's data is still at the version the session loaded
+    (compare-and-swap), otherwise raise WriteConflictError without writing anything
+    """
+    with _locked_user_files(session.user_id) as (snapshot_path, log_path, lock_file):
+        state = _read_log_state(lock_file)
+        if state is None:
+            # No state recorded yet (e.g. data from before versioning), so work it out from the files
+            state = _read_locked(snapshot_path, log_path)[1]
+
+        # A session that replaced the document without loading it first has nothing to conflict with
+        if session.version is not None and state["seq"] != session.version:
+            raise WriteConflictError(
+                f"User data for {session.user_id} is at version {state['seq']}, expected {session.version}"
+            )
+
+        if session.replaced:
+            # A full replace is a new version too, so sessions that loaded the old document conflict
+            state = {"seq": state["seq"] + 1, "records": 0}
+            _write_snapshot_locked(snapshot_path, log_path, session.user_data, state["seq"])
+        else:
+            state = _append_records_locked(snapshot_path, log_path, state, session.user_data, session.records)
+
+        _write_log_state(lock_file, state)
+        session.version = state["seq"]
+        session.records = []
+        session.replaced = False
+
+def _write_snapshot_locked(snapshot_path, log_path, user_data, seq):
+    """Atomically replace a snapshot with the given document and clear the log it now covers"""
+    snapshot = dict(user_data)
+    snapshot["_log_seq"] = seq
+
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+    tmp_path = snapshot_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, snapshot_path)
+
+    # Every record in the log is now covered by the snapshot's _log_seq
+    with open(log_path, "w", encoding="utf-8"):
+        pass
+
+def _append_records_locked(snapshot_path, log_path, state, user_data, records):
+    """Append mutation records to a log, compacting it into a snapshot when it gets long; returns the new log state"""
+    seq = state["seq"]
+    lines = []
+    for record in records:
+        seq += 1
+        record["seq"] = seq
+        lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write("".join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+    record_count = state["records"] + len(records)
+
+    if record_count >= USER_DATA_SNAPSHOT_EVERY:
+        _write_snapshot_locked(snapshot_path, log_path, user_data, seq)
+        record_count = 0
+
+    return {"seq": seq, "records": record_count}
+
+def _commit(user_data, record):
+    """Apply a mutation record to the session's user data and buffer it for the session's commit"""
+    apply_record(user_data, record)
+
+    # Buffer a copy, since the applied objects may change again before the session ends
+    session = _active_session.get()
+    session.user_data = user_data
+    session.records.append(copy.deepcopy(record))
+
+def apply_record(user_data, record):
+    """Apply one mutation record to a user data document; used both when mutating and when replaying the log"""
+    op = record["op"]
+    goals = user_data["user"]["goals"]
+
+    if op == "add_goal":
+        goals.append(record["goal"])
+        user_data["user"]["current_goal_id"] = record["goal"]["id"]
+        user_data.setdefault("_views", {})[str(record["goal"]["id"])] = goal_views.build_views(record["goal"])
+        return
+
+    if op == "set_current_goal":
+        user_data["user"]["current_goal_id"] = record["goal_id"]
+        return
+
+    goal = next((g for g in goals if g["id"] == record["goal_id"]), None)
+    if goal is None:
+        return
+
+    if op == "update_goal":
+        goal.update(record["fields"])
+    elif op == "append_item":
+        goal[record["collection"]].append(record["item"])
+        goal["updated_at"] = record["updated_at"]
+    elif op == "update_item":
+        for item in goal[record["collection"]]:
+            if item["id"] == record["item_id"]:
+                item.update(record["fields"])
+        goal["updated_at"] = record["updated_at"]
+
+    # Keep the goal's views in step; goals without views yet get them built on first read
+    views = user_data.get("_views", {}).get(str(goal["id"]))
+    if views is None:
+        return
+    if op == "append_item":
+        goal_views.add_item(views, record["collection"], record["item"])
+    elif op == "update_item":
+        for item in goal[record["collection"]]:
+            if item["id"] == record["item_id"]:
+                goal_views.update_item(views, record["collection"], item, goal[record["collection"]])
 
 def get_current_goal():
     """Get the current goal the user is working on"""
@@ -61,6 +479,7 @@ def get_goal_by_id(goal_id):
             
     return None
 
+@_mutation
 def add_new_goal(name):
     """Add a new goal and set it as the current goal"""
     user_data = load_user_data()
@@ -83,15 +502,11 @@ def add_new_goal(name):
         "plans": []
     }
     
-    # Add the goal to the user data
-    user_data["user"]["goals"].append(new_goal)
-    
-    # Set it as the current goal
-    user_data["user"]["current_goal_id"] = goal_id
-    
-    save_user_data(user_data)
+    # Add the goal to the user data and set it as the current goal
+    _commit(user_data, {"op": "add_goal", "goal": new_goal})
     return new_goal
 
+@_mutation
 def set_current_goal(goal_id):
     """Set the current goal the user is working on"""
     user_data = load_user_data()
@@ -100,12 +515,12 @@ def set_current_goal(goal_id):
     goal_exists = any(goal["id"] == goal_id for goal in user_data["user"]["goals"])
     
     if goal_exists:
-        user_data["user"]["current_goal_id"] = goal_id
-        save_user_data(user_data)
+        _commit(user_data, {"op": "set_current_goal", "goal_id": goal_id})
         return True
     
     return False
 
+@_mutation
 def update_goal_stage(stage, previous_stage=None):
     """Update the current goal's stage of change"""
     user_data = load_user_data()
@@ -119,15 +534,20 @@ def update_goal_stage(stage, previous_stage=None):
             if previous_stage is None:
                 previous_stage = goal["stage"]
             
-            goal["previous_stage"] = previous_stage
-            goal["stage"] = stage
-            goal["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            save_user_data(user_data)
+            _commit(user_data, {
+                "op": "update_goal",
+                "goal_id": goal["id"],
+                "fields": {
+                    "previous_stage": previous_stage,
+                    "stage": stage,
+                    "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                }
+            })
             return goal
     
     return None
 
+@_mutation
 def add_motivation(content, stage):
     """Add a motivation to the current goal"""
     user_data = load_user_data()
@@ -138,6 +558,11 @@ def add_motivation(content, stage):
     
     for goal in user_data["user"]["goals"]:
         if goal["id"] == current_goal_id:
+            # A motivation the user has voiced before is counted again rather than stored twice
+            repeated = find_duplicate(current_user_id(), goal, "motivations", content)
+            if repeated is not None:
+                return _record_mention(user_data, goal, "motivations", repeated)
+
             # Generate a new motivation ID
             motivation_id = 1
             if goal["motivations"]:
@@ -150,14 +575,18 @@ def add_motivation(content, stage):
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
             
-            goal["motivations"].append(motivation)
-            goal["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            save_user_data(user_data)
+            _commit(user_data, {
+                "op": "append_item",
+                "goal_id": goal["id"],
+                "collection": "motivations",
+                "item": motivation,
+                "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            })
             return motivation
     
     return None
 
+@_mutation
 def add_plan(action, timeline, difficulty):
     """Add a specific plan or implementation intention to the current goal"""
     user_data = load_user_data()
@@ -168,6 +597,12 @@ def add_plan(action, timeline, difficulty):
     
     for goal in user_data["user"]["goals"]:
         if goal["id"] == current_goal_id:
+            # Restating an active plan counts as another mention; a finished plan made again is a new plan
+            repeated = find_duplicate(current_user_id(), goal, "plans", action,
+                                      accept=lambda p: p["status"] == "active")
+            if repeated is not None:
+                return _record_mention(user_data, goal, "plans", repeated)
+
             # Generate a new plan ID
             plan_id = 1
             if goal["plans"]:
@@ -182,14 +617,18 @@ def add_plan(action, timeline, difficulty):
                 "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
             
-            goal["plans"].append(plan)
-            goal["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            save_user_data(user_data)
+            _commit(user_data, {
+                "op": "append_item",
+                "goal_id": goal["id"],
+                "collection": "plans",
+                "item": plan,
+                "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            })
             return plan
     
     return None
 
+@_mutation
 def update_plan_status(plan_id, status):
     """Update the status of a plan in the current goal"""
     user_data = load_user_data()
@@ -202,14 +641,19 @@ def update_plan_status(plan_id, status):
         if goal["id"] == current_goal_id:
             for plan in goal["plans"]:
                 if plan["id"] == plan_id:
-                    plan["status"] = status
-                    goal["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    save_user_data(user_data)
+                    _commit(user_data, {
+                        "op": "update_item",
+                        "goal_id": goal["id"],
+                        "collection": "plans",
+                        "item_id": plan_id,
+                        "fields": {"status": status},
+                        "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    })
                     return plan
     
     return None
 
+@_mutation
 def add_solution(name, description, effectiveness):
     """Add a new solution to the current goal"""
     user_data = load_user_data()
@@ -220,6 +664,11 @@ def add_solution(name, description, effectiveness):
     
     for goal in user_data["user"]["goals"]:
         if goal["id"] == current_goal_id:
+            # A solution reported again keeps its place, with the latest rating of how well it worked
+            repeated = find_duplicate(current_user_id(), goal, "solutions", description)
+            if repeated is not None:
+                return _record_mention(user_data, goal, "solutions", repeated, {"effectiveness": effectiveness})
+
             # Generate a new solution ID
             solution_id = 1
             if goal["solutions"]:
@@ -233,14 +682,30 @@ def add_solution(name, description, effectiveness):
                 "date_added": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
             
-            goal["solutions"].append(solution)
-            goal["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            save_user_data(user_data)
+            _commit(user_data, {
+                "op": "append_item",
+                "goal_id": goal["id"],
+                "collection": "solutions",
+                "item": solution,
+                "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            })
             return solution
     
     return None
 
+def _record_mention(user_data, goal, collection, item, fields=None):
+    """Count a repeat of an existing motivation, plan or solution and return the updated item"""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    _commit(user_data, {
+        "op": "update_item",
+        "goal_id": goal["id"],
+        "collection": collection,
+        "item_id": item["id"],
+        "fields": {**(fields or {}), "mentions": item.get("mentions", 1) + 1, "last_mentioned": now},
+        "updated_at": now
+    })
+    return item
+
 def get_solutions_for_current_goal():
     """Get all solutions for the current goal"""
     goal = get_current_goal()
@@ -273,6 +738,24 @@ def get_motivations_for_current_goal(limit=None):
     
     return motivations
 
+def get_goal_views(goal_id=None):
+    """
+    Get the materialized views of a goal (the current goal by default): motivations by stage,
+    active plans and top solutions with their prompt lines (see goal_views.py); None if there is no such goal
+    """
+    user_data = load_user_data()
+    if goal_id is None:
+        goal_id = user_data["user"]["current_goal_id"]
+    
+    views = user_data.setdefault("_views", {})
+    if str(goal_id) not in views:
+        goal = next((g for g in user_data["user"]["goals"] if g["id"] == goal_id), None)
+        if goal is None:
+            return None
+        views[str(goal_id)] = goal_views.build_views(goal)
+    
+    return views[str(goal_id)]
+
 def get_all_goals():
     """Get all goals"""
     user_data = load_user_data()
@@ -1,10 +1,165 @@
 # extractors.py
-import json
 import os
-from openai import OpenAI
+import re
+import json
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from utils.data_storage import get_current_goal
+from utils.openai_client import get_client, get_async_client
+from utils.llm_cache import cached_completion, cached_completion_async
+
+client = get_client()
+
+GOAL_EXTRACTION_PROMPT = """
+Determine if the user is specifying a habit goal. If yes, extract it clearly.
+For example, if they say "I want to exercise more regularly", the goal is "exercise more regularly".
+If they're not specifying a goal, respond with 'NO_GOAL'.
+"""
+
+PLAN_ADOPTION_PROMPT = """
+You are an AI assistant specialized in extracting behavior change plans from therapeutic conversations.
+
+The user has agreed to adopt plans that were suggested in the previous assistant message.
+Your task is to extract these plans from the assistant's message and format them as structured plans.
+
+For each plan identified in the assistant's message, extract:
+1. The specific action to be taken
+2. When or in what context it will be done (timeline)
+3. An estimate of difficulty (easy, medium, hard)
+
+Format the results as a JSON array of plan objects, each with these fields:
+- "action": The specific action to take
+- "timeline": When or in what context
+- "difficulty": Estimated difficulty (easy, medium, hard)
+
+Example assistant message:
+"Here are some tips: 1) Set an alarm for 10pm to remind you to start winding down. 2) Create a bedtime routine including reading for 15 minutes."
+
+Example output:
+[
+  {
+    "action": "Set an alarm for 10pm",
+    "timeline": "Every night at 10pm",
+    "difficulty": "easy"
+  },
+  {
+    "action": "Read for 15 minutes before bed",
+    "timeline": "As part of bedtime routine",
+    "difficulty": "medium"
+  }
+]
+
+If no specific plans can be identified, return an empty array: []
+"""
+
+PLAN_EXTRACTION_PROMPT = """
+You are an AI assistant specialized in identifying plans or implementation intentions in therapeutic conversations.
+Your task is to analyze the user's message and determine if it contains a specific plan for behavior change.
+
+A plan typically includes:
+1. A specific action the user intends to take
+2. When or in what context they plan to do it (timeline)
+3. Related to their habit goal
+
+Examples of plans that should be identified:
+- "I'll set an alarm for 10pm to remind me to start winding down for bed." (action: set alarm, timeline: 10pm)
+- "Tomorrow morning I'll meditate for 5 minutes right after brushing my teeth." (action: meditate for 5 minutes, timeline: after brushing teeth)
+- "When I feel stressed at work, I'll take 3 deep breaths before responding." (action: take 3 deep breaths, timeline: when stressed at work)
+
+If you identify a plan, extract these components and format them as JSON with these fields:
+- "action": The specific action they plan to take
+- "timeline": When or in what context they will do it
+- "difficulty": Estimate how difficult this plan might be (easy, medium, hard)
+
+If there's no specific plan in the text, return {"is_plan": false}.
+"""
+
+MOTIVATION_EXTRACTION_PROMPT = """
+You are an AI assistant specialized in identifying motivations for behavior change in therapeutic conversations.
+Your task is to analyze the user's message and extract their key motivations - what's driving them to change or not change?
+
+Look for:
+1. Values they care about (health, family, career, etc.)
+2. Goals they want to achieve
+3. Benefits they hope to gain from change
+4. Barriers or concerns that may be holding them back
+
+Be concise but capture the essence of their motivation. If no clear motivation is expressed, respond with "NO_MOTIVATION".
+"""
+
+SOLUTION_EXTRACTION_PROMPT = """
+You are an AI assistant specialized in identifying solutions in therapeutic conversations.
+Your task is to analyze the user's message and determine if it contains a solution to a problem or habit they're working on.
+
+A solution can be explicitly or implicitly stated. It typically includes:
+1. An action, approach, or technique they tried or found helpful
+2. Optionally, how effective it was or the outcome they experienced
+
+Examples of solutions that should be identified:
+- "Reading before sleep is good. I can sleep well after it." (solution: reading before sleep)
+- "I found that taking deep breaths helps with my anxiety." (solution: taking deep breaths)
+- "Drinking water throughout the day improved my focus." (solution: drinking water throughout the day)
+- "When I feel stressed, going for a walk helps me calm down." (solution: going for a walk)
+- "Meditation for 5 minutes in the morning makes my day better." (solution: meditation for 5 minutes)
+
+Be generous in your interpretation - if the user is sharing something that worked for them, even if briefly stated, consider it a solution.
+
+If you identify a solution, extract these components and format them as JSON with these fields:
+- "name": A short name for the solution
+- "description": The solution or technique that helped in detail
+- "effectiveness": How well it worked (high, medium, low) if mentioned
+
+If there's no solution in the text, return {"is_solution": false}.
+"""
+
+# Phrases that mean the user is adopting plans suggested in the assistant's previous message
+PLAN_ADOPTION_PHRASES = [
+    "i will adopt", "sounds good", "i'll try", "i'll do that", "i'll implement", 
+    "i agree", "i'll follow", "i'll use", "will try", "ok", "okay", "yes", "good plan"
+]
+
+# The phrases as whole words, so "ok" no longer matches "book" and "yes" no longer matches "eyes"
+PLAN_ADOPTION_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(phrase) for phrase in sorted(PLAN_ADOPTION_PHRASES, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+
+# Assistant replies that suggest plans: list items, or explicit suggestion phrases. Single words
+# like "try" or "could" appear in almost every coaching reply, so they are not enough on their own
+PLAN_SUGGESTION_PHRASES = [
+    "you could try", "you might try", "you can try", "you could start", "why not try", "how about",
+    "what if you", "i suggest", "i'd suggest", "i would suggest", "i recommend", "i'd recommend",
+    "one option is", "one idea is", "here are some"
+]
+PLAN_SUGGESTION_PATTERN = re.compile(
+    r"^\s*(?:\d+[.)]|[-*\u2022])\s|\b(?:" + "|".join(re.escape(phrase) for phrase in PLAN_SUGGESTION_PHRASES) + r")\b",
+    re.IGNORECASE | re.MULTILINE
+)
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Seconds a turn waits for the background extraction of the plans it is adopting
+PLAN_CANDIDATES_TIMEOUT = float(os.getenv("PLAN_CANDIDATES_TIMEOUT", "10"))
+
+# Plans suggested in recent assistant replies, extracted in the background as each reply is produced
+PLAN_CANDIDATES_MAX_REPLIES = 1024
+_plan_candidates = OrderedDict()
+_plan_candidates_lock = threading.Lock()
+_plan_candidates_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="plan-candidates")
+
+# Each extractor is split into a request builder, which returns the chat completion arguments and
+# a parser for the response content, so the sync and async versions differ only in the API call
+
+def _goal_request(text):
+    """Build the goal extraction request"""
+    request = {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": GOAL_EXTRACTION_PROMPT},
+            {"role": "user", "content": text}
+        ]
+    }
+    return request, parse_goal_result
 
 def extract_goal_from_text(text):
     """
@@ -12,164 +167,186 @@ def extract_goal_from_text(text):
     Returns the goal string or None if no goal is found
     """
     try:
-        system_prompt = """
-        Determine if the user is specifying a habit goal. If yes, extract it clearly. 
-        For example, if they say "I want to exercise more regularly", the goal is "exercise more regularly".
-        If they're not specifying a goal, respond with 'NO_GOAL'.
-        """
-        
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": text}
-            ],
-        )
+        request, parse = _goal_request(text)
+        return parse(cached_completion(client, request))
         
-        goal = response.choices[0].message.content.strip()
-        
-        return None if goal == "NO_GOAL" else goal
+    except Exception as e:
+        print(f"Error extracting goal: {str(e)}")
+        return None
+
+async def extract_goal_from_text_async(text):
+    """Async version of extract_goal_from_text"""
+    try:
+        request, parse = _goal_request(text)
+        return parse(await cached_completion_async(get_async_client(), request))
         
     except Exception as e:
         print(f"Error extracting goal: {str(e)}")
         return None
 
+def parse_goal_result(result):
+    """Normalize a goal extraction result into the goal text, or None if there is no goal"""
+    goal = result.strip()
+    
+    return None if goal == "NO_GOAL" else goal
+
+def _suggested_plans_request(assistant_message):
+    """Build the request that extracts the plans suggested in an assistant reply"""
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": PLAN_ADOPTION_PROMPT},
+            {"role": "user", "content": f"Assistant's previous message: {assistant_message}"}
+        ],
+        "response_format": {"type": "json_object"}
+    }
+
+def _plan_request(text):
+    """Build the request that extracts a plan the user states explicitly"""
+    request = {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": PLAN_EXTRACTION_PROMPT},
+            {"role": "user", "content": f"Analyze this text for plans: {text}"}
+        ],
+        "response_format": {"type": "json_object"}
+    }
+    return request, lambda content: parse_plan_result(json.loads(content))
+
+def is_plan_adoption(text):
+    """Check whether the user is agreeing to the assistant's suggestions"""
+    # Normalize typographic apostrophes so "I’ll try" matches "i'll try"
+    return PLAN_ADOPTION_PATTERN.search(text.replace("\u2019", "'")) is not None
+
+def precompute_plan_candidates(assistant_message, only_if_suggested=False):
+    """
+    Start extracting the plans suggested in an assistant reply in the background, so a user adopting
+    them later does not wait on the call; returns a future of the list of plans
+    With only_if_suggested, replies that do not look like they suggest anything are skipped (returns None).
+    """
+    with _plan_candidates_lock:
+        future = _plan_candidates.get(assistant_message)
+        if future is not None:
+            _plan_candidates.move_to_end(assistant_message)
+            return future
+        
+        if only_if_suggested and not PLAN_SUGGESTION_PATTERN.search(assistant_message):
+            return None
+        
+        future = _plan_candidates_executor.submit(extract_suggested_plans, assistant_message)
+        _plan_candidates[assistant_message] = future
+        while len(_plan_candidates) > PLAN_CANDIDATES_MAX_REPLIES:
+            _plan_candidates.popitem(last=False)
+        return future
+
+def extract_suggested_plans(assistant_message):
+    """Use OpenAI API to extract the list of plans suggested in an assistant reply"""
+    try:
+        return parse_suggested_plans(cached_completion(client, _suggested_plans_request(assistant_message)))
+    
+    except Exception as e:
+        print(f"Error extracting suggested plans: {str(e)}")
+        return []
+
 def extract_plan_from_text(text, previous_assistant_message=None):
     """
     Use OpenAI API to determine if the text contains a plan or if the user is adopting plans suggested by the assistant
     Returns a dictionary with extracted fields or None if extraction failed
     """
     try:
-        current_goal = get_current_goal()
-        goal_name = current_goal["name"] if current_goal else None
-        
-        # If the user is adopting plans from the assistant's message
-        if previous_assistant_message and any(phrase in text.lower() for phrase in [
-            "i will adopt", "sounds good", "i'll try", "i'll do that", "i'll implement", 
-            "i agree", "i'll follow", "i'll use", "will try", "ok", "okay", "yes", "good plan"
-        ]):
-            # System prompt for extracting plans from the assistant's previous message
-            system_prompt = """
-            You are an AI assistant specialized in extracting behavior change plans from therapeutic conversations.
-            
-            The user has agreed to adopt plans that were suggested in the previous assistant message.
-            Your task is to extract these plans from the assistant's message and format them as structured plans.
-            
-            For each plan identified in the assistant's message, extract:
-            1. The specific action to be taken
-            2. When or in what context it will be done (timeline)
-            3. An estimate of difficulty (easy, medium, hard)
-            
-            Format the results as a JSON array of plan objects, each with these fields:
-            - "action": The specific action to take
-            - "timeline": When or in what context
-            - "difficulty": Estimated difficulty (easy, medium, hard)
-            
-            Example assistant message:
-            "Here are some tips: 1) Set an alarm for 10pm to remind you to start winding down. 2) Create a bedtime routine including reading for 15 minutes."
-            
-            Example output:
-            [
-              {
-                "action": "Set an alarm for 10pm",
-                "timeline": "Every night at 10pm",
-                "difficulty": "easy"
-              },
-              {
-                "action": "Read for 15 minutes before bed",
-                "timeline": "As part of bedtime routine",
-                "difficulty": "medium"
-              }
-            ]
-            
-            If no specific plans can be identified, return an empty array: []
-            """
-            
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"User's message: {text}\n\nAssistant's previous message: {previous_assistant_message}"}
-                ],
-                response_format={"type": "json_object"}
-            )
-            
-            try:
-                # First try parsing as a direct JSON response
-                result = json.loads(response.choices[0].message.content)
-                
-                # Handle both array and object formats
-                if isinstance(result, list) and len(result) > 0:
-                    return result[0]
-                elif "plans" in result and isinstance(result["plans"], list) and len(result["plans"]) > 0:
-                    return result["plans"][0]
-                else:
-                    # No plans were found
-                    return None
-            except json.JSONDecodeError:
-                # If not valid JSON, return None
-                print("Failed to extract plan from assistant's suggestions")
-                return None
+        # If the user is adopting plans from the assistant's message, take the first one suggested there
+        if previous_assistant_message and is_plan_adoption(text):
+            plans = precompute_plan_candidates(previous_assistant_message).result(timeout=PLAN_CANDIDATES_TIMEOUT)
+            return plans[0] if plans else None
         
         # Original functionality for when the user explicitly states a plan
-        system_prompt = """
-        You are an AI assistant specialized in identifying plans or implementation intentions in therapeutic conversations.
-        Your task is to analyze the user's message and determine if it contains a specific plan for behavior change.
+        request, parse = _plan_request(text)
+        return parse(cached_completion(client, request))
         
-        A plan typically includes:
-        1. A specific action the user intends to take
-        2. When or in what context they plan to do it (timeline)
-        3. Related to their habit goal
-        
-        Examples of plans that should be identified:
-        - "I'll set an alarm for 10pm to remind me to start winding down for bed." (action: set alarm, timeline: 10pm)
-        - "Tomorrow morning I'll meditate for 5 minutes right after brushing my teeth." (action: meditate for 5 minutes, timeline: after brushing teeth)
-        - "When I feel stressed at work, I'll take 3 deep breaths before responding." (action: take 3 deep breaths, timeline: when stressed at work)
-        
-        If you identify a plan, extract these components and format them as JSON with these fields:
-        - "action": The specific action they plan to take
-        - "timeline": When or in what context they will do it
-        - "difficulty": Estimate how difficult this plan might be (easy, medium, hard)
+    except FutureTimeoutError:
+        print(f"Error extracting plan: suggested plans not ready after {PLAN_CANDIDATES_TIMEOUT}s")
+        return None
+    except Exception as e:
+        print(f"Error extracting plan: {str(e)}")
+        return None
+
+async def extract_plan_from_text_async(text, previous_assistant_message=None):
+    """Async version of extract_plan_from_text"""
+    try:
+        if previous_assistant_message and is_plan_adoption(text):
+            # Shielded, so a timed-out turn doesn't cancel the extraction other turns share
+            plans = await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(precompute_plan_candidates(previous_assistant_message))),
+                PLAN_CANDIDATES_TIMEOUT
+            )
+            return plans[0] if plans else None
         
-        If there's no specific plan in the text, return {"is_plan": false}.
-        """
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Analyze this text for plans: {text}"}
-            ],
-            response_format={"type": "json_object"}
-        )
-
-        result = json.loads(response.choices[0].message.content)
+        request, parse = _plan_request(text)
+        return parse(await cached_completion_async(get_async_client(), request))
         
-        if "is_plan" in result and result["is_plan"] is False:
-            return None
-            
-        plan = {}
+    except asyncio.TimeoutError:
+        print(f"Error extracting plan: suggested plans not ready after {PLAN_CANDIDATES_TIMEOUT}s")
+        return None
+    except Exception as e:
+        print(f"Error extracting plan: {str(e)}")
+        return None
+
+def parse_suggested_plans(content):
+    """Return the list of plans extracted from the assistant's suggestions, empty if there are none"""
+    try:
+        # First try parsing as a direct JSON response
+        result = json.loads(content)
         
-        if "action" in result and result["action"]:
-            plan["action"] = result["action"]
-        else:
-            return None  # No action identified
-            
-        if "timeline" in result and result["timeline"]:
-            plan["timeline"] = result["timeline"]
+        # Handle both array and object formats
+        if isinstance(result, list):
+            return result
+        elif "plans" in result and isinstance(result["plans"], list):
+            return result["plans"]
+        elif "action" in result:
+            # A single plan returned on its own
+            return [result]
         else:
-            plan["timeline"] = "as soon as possible"
-            
-        if "difficulty" in result and result["difficulty"]:
-            plan["difficulty"] = result["difficulty"].lower()
-        else:
-            plan["difficulty"] = "medium"
+            # No plans were found
+            return []
+    except json.JSONDecodeError:
+        # If not valid JSON, return no plans
+        print("Failed to extract plan from assistant's suggestions")
+        return []
+
+def parse_plan_result(result):
+    """Normalize a plan extraction result into a plan dictionary, or None if there is no plan"""
+    if not result or ("is_plan" in result and result["is_plan"] is False):
+        return None
         
-        return plan
+    plan = {}
+    
+    if "action" in result and result["action"]:
+        plan["action"] = result["action"]
+    else:
+        return None  # No action identified
         
-    except Exception as e:
-        print(f"Error extracting plan: {str(e)}")
-        return None
+    if "timeline" in result and result["timeline"]:
+        plan["timeline"] = result["timeline"]
+    else:
+        plan["timeline"] = "as soon as possible"
+        
+    if "difficulty" in result and result["difficulty"]:
+        plan["difficulty"] = result["difficulty"].lower()
+    else:
+        plan["difficulty"] = "medium"
+    
+    return plan
+
+def _motivation_request(text):
+    """Build the motivation extraction request"""
+    request = {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": MOTIVATION_EXTRACTION_PROMPT},
+            {"role": "user", "content": f"Extract motivation from: {text}"}
+        ]
+    }
+    return request, parse_motivation_result
 
 def extract_motivation_from_text(text):
     """
@@ -177,112 +354,100 @@ def extract_motivation_from_text(text):
     Returns the motivation content or None if extraction failed
     """
     try:
-        system_prompt = """
-        You are an AI assistant specialized in identifying motivations for behavior change in therapeutic conversations.
-        Your task is to analyze the user's message and extract their key motivations - what's driving them to change or not change?
-        
-        Look for:
-        1. Values they care about (health, family, career, etc.)
-        2. Goals they want to achieve
-        3. Benefits they hope to gain from change
-        4. Barriers or concerns that may be holding them back
+        request, parse = _motivation_request(text)
+        return parse(cached_completion(client, request))
         
-        Be concise but capture the essence of their motivation. If no clear motivation is expressed, respond with "NO_MOTIVATION".
-        """
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Extract motivation from: {text}"}
-            ],
-        )
-
-        result = response.choices[0].message.content.strip()
-        
-        # Simple string check instead of trying to parse JSON
-        if result == "NO_MOTIVATION":
-            return None
-            
-        return result
+    except Exception as e:
+        print(f"Error extracting motivation: {str(e)}")
+        return None
+
+async def extract_motivation_from_text_async(text):
+    """Async version of extract_motivation_from_text"""
+    try:
+        request, parse = _motivation_request(text)
+        return parse(await cached_completion_async(get_async_client(), request))
         
     except Exception as e:
         print(f"Error extracting motivation: {str(e)}")
         return None
 
+def parse_motivation_result(result):
+    """Normalize a motivation extraction result into the motivation text, or None if there is none"""
+    if result is None:
+        return None
+    
+    result = result.strip()
+    
+    # Simple string check instead of trying to parse JSON
+    if not result or result == "NO_MOTIVATION":
+        return None
+        
+    return result
+
+def _solution_request(text):
+    """Build the solution extraction request"""
+    # Get the current goal as context
+    current_goal = get_current_goal()
+    goal_name = current_goal["name"] if current_goal else None
+    
+    request = {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": SOLUTION_EXTRACTION_PROMPT},
+            {"role": "user", "content": f"Analyze this text for solutions: {text}"}
+        ],
+        "response_format": {"type": "json_object"}
+    }
+    return request, lambda content: parse_solution_result(json.loads(content))
+
 def extract_solution_from_text(text):
     """
     Use OpenAI API to determine if the text contains a solution and extract relevant information
     Returns a dictionary with extracted fields or None if extraction failed
     """
     try:
-        # Get the current goal as context
-        current_goal = get_current_goal()
-        goal_name = current_goal["name"] if current_goal else None
+        request, parse = _solution_request(text)
+        return parse(cached_completion(client, request))
         
-        system_prompt = """
-        You are an AI assistant specialized in identifying solutions in therapeutic conversations.
-        Your task is to analyze the user's message and determine if it contains a solution to a problem or habit they're working on.
-        
-        A solution can be explicitly or implicitly stated. It typically includes:
-        1. An action, approach, or technique they tried or found helpful
-        2. Optionally, how effective it was or the outcome they experienced
-        
-        Examples of solutions that should be identified:
-        - "Reading before sleep is good. I can sleep well after it." (solution: reading before sleep)
-        - "I found that taking deep breaths helps with my anxiety." (solution: taking deep breaths)
-        - "Drinking water throughout the day improved my focus." (solution: drinking water throughout the day)
-        - "When I feel stressed, going for a walk helps me calm down." (solution: going for a walk)
-        - "Meditation for 5 minutes in the morning makes my day better." (solution: meditation for 5 minutes)
-        
-        Be generous in your interpretation - if the user is sharing something that worked for them, even if briefly stated, consider it a solution.
-        
-        If you identify a solution, extract these components and format them as JSON with these fields:
-        - "name": A short name for the solution
-        - "description": The solution or technique that helped in detail
-        - "effectiveness": How well it worked (high, medium, low) if mentioned
-        
-        If there's no solution in the text, return {"is_solution": false}.
-        """
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Analyze this text for solutions: {text}"}
-            ],
-            response_format={"type": "json_object"}
-        )
-
-        result = json.loads(response.choices[0].message.content)
+    except Exception as e:
+        print(f"Error extracting solution: {str(e)}")
+        return None
+
+async def extract_solution_from_text_async(text):
+    """Async version of extract_solution_from_text"""
+    try:
+        request, parse = _solution_request(text)
+        return parse(await cached_completion_async(get_async_client(), request))
         
-        if "is_solution" in result and result["is_solution"] is False:
-            return None
-            
-        solution = {}
+    except Exception as e:
+        print(f"Error extracting solution: {str(e)}")
+        return None
+
+def parse_solution_result(result):
+    """Normalize a solution extraction result into a solution dictionary, or None if there is no solution"""
+    if not result or ("is_solution" in result and result["is_solution"] is False):
+        return None
         
-        # Extract solution name
-        if "name" in result and result["name"]:
-            solution["name"] = result["name"]
-        else:
-            solution["name"] = "Solution"
-            
-        # Extract solution description
-        if "description" in result and result["description"]:
-            solution["description"] = result["description"]
-        elif "solution" in result and result["solution"]:
-            solution["description"] = result["solution"]
-        else:
-            return None  # No solution description identified
-            
-        # Extract effectiveness if available
-        if "effectiveness" in result and result["effectiveness"]:
-            solution["effectiveness"] = result["effectiveness"].lower()
-        else:
-            solution["effectiveness"] = "medium"  # Default effectiveness
+    solution = {}
+    
+    # Extract solution name
+    if "name" in result and result["name"]:
+        solution["name"] = result["name"]
+    else:
+        solution["name"] = "Solution"
         
-        return solution
+    # Extract solution description
+    if "description" in result and result["description"]:
+        solution["description"] = result["description"]
+    elif "solution" in result and result["solution"]:
+        solution["description"] = result["solution"]
+    else:
+        return None  # No solution description identified
         
-    except Exception as e:
-        print(f"Error extracting solution: {str(e)}")
-        return None
\ No newline at end of file
+    # Extract effectiveness if available
+    if "effectiveness" in result and result["effectiveness"]:
+        solution["effectiveness"] = result["effectiveness"].lower()
+    else:
+        solution["effectiveness"] = "medium"  # Default effectiveness
+    
+    return solution
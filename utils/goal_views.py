@@ -0,0 +1,91 @@
+# goal_views.py
+# Materialized per-goal views of the data the prompt context is built from: motivations bucketed
+# by stage (the newest few per stage), the active plans, and the top solutions by effectiveness.
+# Each entry carries its pre-rendered prompt line. data_storage keeps the views in the user data
+# document and updates them in apply_record as each mutation is applied, so building a prompt
+# reads a few small lists however long the goal's history grows.
+
+# Entries kept per view
+VIEW_TOP_SOLUTIONS = 5
+VIEW_MOTIVATIONS_PER_STAGE = 3
+
+EFFECTIVENESS_SCORES = {
+    "high": 1.0,
+    "medium": 0.6,
+    "low": 0.3
+}
+
+def build_views(goal):
+    """Build a goal's views from scratch, for goals stored before views existed"""
+    views = {"solutions": [], "plans": [], "motivations": {}}
+    for collection in ("solutions", "plans", "motivations"):
+        for item in goal.get(collection, []):
+            add_item(views, collection, item)
+    return views
+
+def render_entry(collection, item):
+    """Return a view entry for a solution, plan or motivation: its id, repeat key and prompt line"""
+    if collection == "solutions":
+        entry = _entry(item, item["description"], f"{item['description']} (Effectiveness: {_effectiveness(item)})")
+        entry["effectiveness"] = _effectiveness(item)
+    elif collection == "plans":
+        entry = _entry(item, item["action"], f"{item['action']} ({item['timeline']})")
+    else:
+        entry = _entry(item, item["content"], f"\"{item['content']}\" (when in {item['stage']} stage)")
+        entry["stage"] = item["stage"]
+    return entry
+
+def add_item(views, collection, item):
+    """Add a newly appended solution, plan or motivation to a goal's views"""
+    if collection == "solutions":
+        # Best first, newest first among equals, keeping the better copy of a repeated solution
+        solutions = sorted(views["solutions"] + [render_entry(collection, item)], reverse=True,
+                           key=lambda s: (EFFECTIVENESS_SCORES.get(s["effectiveness"], 0.6), s["id"]))
+        seen = set()
+        views["solutions"] = [s for s in solutions if not (s["key"] in seen or seen.add(s["key"]))][:VIEW_TOP_SOLUTIONS]
+
+    elif collection == "plans":
+        if item.get("status") == "active":
+            views["plans"].append(render_entry(collection, item))
+
+    elif collection == "motivations":
+        entry = render_entry(collection, item)
+        bucket = [m for m in views["motivations"].get(item["stage"], []) if m["key"] != entry["key"]] + [entry]
+        views["motivations"][item["stage"]] = bucket[-VIEW_MOTIVATIONS_PER_STAGE:]
+
+def update_item(views, collection, item, items):
+    """
+    Refresh a goal's views after an item changed (a plan completed, a solution re-rated, a repeat counted)
+    items is the goal's whole list for the collection, since a solution re-rated down may make room for another.
+    """
+    if collection == "motivations":
+        # A motivation's text and stage never change, so it keeps its place (or stays out of the view)
+        for stage, bucket in views["motivations"].items():
+            views["motivations"][stage] = [render_entry(collection, item) if m["id"] == item["id"] else m for m in bucket]
+        return
+
+    if collection == "solutions" and any(entry["id"] == item["id"] for entry in views["solutions"]):
+        # Its rank may have dropped, so the next best solution, which the view no longer holds, may belong in it
+        views["solutions"] = []
+        for solution in items:
+            add_item(views, collection, solution)
+        return
+
+    views[collection] = [entry for entry in views[collection] if entry["id"] != item["id"]]
+    add_item(views, collection, item)
+    if collection == "plans":
+        # Plans stay in the order they were made
+        views["plans"].sort(key=lambda entry: entry["id"])
+
+def normalize(text):
+    """Lowercase text and collapse punctuation and spacing, so repeats compare equal"""
+    return " ".join("".join(c if c.isalnum() else " " for c in text.lower()).split())
+
+def _entry(item, key_text, line):
+    return {"id": item["id"], "key": normalize(key_text), "text": f"- {line}"}
+
+def effectiveness_score(item):
+    return EFFECTIVENESS_SCORES.get(_effectiveness(item), 0.6)
+
+def _effectiveness(item):
+    return str(item.get("effectiveness") or "medium").lower()
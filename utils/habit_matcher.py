@@ -0,0 +1,99 @@
+# habit_matcher.py
+# Finds every known habit mentioned in a message in one pass over the message, however many
+# habits there are. The habits go into an Aho-Corasick automaton: a trie of the habit strings
+# with failure links, so a mismatch falls back to the longest suffix that is still a prefix of
+# some habit instead of restarting. Adding a habit inserts it into the trie and marks the links
+# stale; they are recomputed (in time linear in the trie's size) on the next match.
+from collections import deque
+
+class HabitMatcher:
+    """Aho-Corasick automaton over a growing set of habit strings; not thread-safe"""
+
+    def __init__(self, habits=()):
+        # Node 0 is the root; each node has its transitions, failure link, the habit that ends
+        # there (or None) and a link to the nearest node down its failure chain that ends a habit
+        self.children = [{}]
+        self.fail = [0]
+        self.habit = [None]
+        self.output = [0]
+        self._stale = False
+        for habit in habits:
+            self.add(habit)
+
+    def __len__(self):
+        return sum(1 for habit in self.habit if habit is not None)
+
+    def __contains__(self, habit):
+        node = self._find(habit)
+        return node is not None and self.habit[node] is not None
+
+    def add(self, habit):
+        """Add a habit string; returns False if it was already known or is empty"""
+        if not habit:
+            return False
+
+        node = 0
+        for char in habit:
+            child = self.children[node].get(char)
+            if child is None:
+                child = len(self.children)
+                self.children.append({})
+                self.fail.append(0)
+                self.habit.append(None)
+                self.output.append(0)
+                self.children[node][char] = child
+            node = child
+
+        if self.habit[node] is not None:
+            return False
+        self.habit[node] = habit
+        self._stale = True
+        return True
+
+    def match(self, text):
+        """Return the set of habits that occur anywhere in text"""
+        if self._stale:
+            self._link()
+
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in self.children[node]:
+                node = self.fail[node]
+            node = self.children[node].get(char, 0)
+
+            ending = node if self.habit[node] is not None else self.output[node]
+            while ending:
+                found.add(self.habit[ending])
+                ending = self.output[ending]
+        return found
+
+    def _find(self, habit):
+        node = 0
+        for char in habit:
+            node = self.children[node].get(char)
+            if node is None:
+                return None
+        return node
+
+    def _link(self):
+        """Recompute the failure and output links breadth first, parents before children"""
+        queue = deque()
+        for child in self.children[0].values():
+            self.fail[child] = 0
+            self.output[child] = 0
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self.children[node].items():
+                fallback = self.fail[node]
+                while fallback and char not in self.children[fallback]:
+                    fallback = self.fail[fallback]
+                fallback = self.children[fallback].get(char, 0)
+
+                self.fail[child] = fallback
+                self.output[child] = fallback if self.habit[fallback] is not None else self.output[fallback]
+                queue.append(child)
+
+        self._stale = False
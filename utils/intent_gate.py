@@ -0,0 +1,228 @@
+# intent_gate.py
+# Decides, before any API call, which extractors (motivation, plan, solution) could possibly find
+# something in a message, so the rest are skipped. Rules handle the clear cases (small talk, adopting
+# the assistant's suggestions); a per-extractor model trained on logged extractor outcomes decides
+# the rest, or keyword cues until a model has been trained. The outcome log is capped at
+# INTENT_LABELS_MAX_BYTES (see utils/label_log.py).
+#
+# A small random share of skipped calls is still run as a shadow sample: when one of them finds
+# something, the gate was wrong, which gives the false-negative rate reported by get_gate_stats.
+#
+# Train or retrain the models with: python -m utils.intent_gate
+import os
+import re
+import random
+import asyncio
+import threading
+
+from utils.extractors import is_plan_adoption
+from utils.label_log import append_label, read_labels
+from utils.linear_model import HAS_NUMPY, predict_proba, train_model, save_model, load_model
+
+# "sft_solution" is app.py's solution extractor, whose prompt and acceptance rule differ from the
+# coach's, so its outcomes are logged and its model trained separately
+EXTRACTORS = ("motivation", "plan", "solution", "sft_solution")
+
+# Set INTENT_GATE=0 to run every extractor on every message
+INTENT_GATE_ENABLED = os.getenv("INTENT_GATE", "1") != "0"
+
+# A trained model runs its extractor when the probability of a result is at least this; kept low
+# because a skipped result is lost while a wasted call only costs time
+INTENT_GATE_MIN_PROBABILITY = float(os.getenv("INTENT_GATE_MIN_PROBABILITY", "0.15"))
+
+# Share of skipped calls run anyway to measure how often the gate skips a real result
+INTENT_GATE_SHADOW_RATE = float(os.getenv("INTENT_GATE_SHADOW_RATE", "0.05"))
+
+INTENT_GATE_FEATURES = int(os.getenv("INTENT_GATE_FEATURES", str(2 ** 16)))
+
+# Where extractor outcomes are logged, and where each extractor's model is saved
+INTENT_LABELS_PATH = os.getenv("INTENT_LABELS_PATH", os.path.join(os.path.dirname(__file__), "intent_labels.jsonl"))
+INTENT_MODEL_DIR = os.getenv("INTENT_MODEL_DIR", os.path.dirname(__file__))
+
+# Bytes the outcome log may grow to before it is rotated; 0 stops logging the users' messages
+INTENT_LABELS_MAX_BYTES = int(os.getenv("INTENT_LABELS_MAX_BYTES", str(5 * 1024 * 1024)))
+
+# Fewest distinct logged messages per extractor worth training on
+MIN_TRAINING_EXAMPLES = 50
+
+# Greetings, thanks and acknowledgements that carry nothing to extract
+SMALL_TALK_PATTERN = re.compile(
+    r"\s*(hi|hey|hello|yo|thanks|thank you|thx|ty|ok|okay|k|cool|nice|great|good|yes|yeah|yep|no|nope|"
+    r"sure|bye|goodbye|good (morning|night|evening)|lol|hmm+|see you)[\s!.?,]*(there|again|so much|a lot)?[\s!.?]*",
+    re.IGNORECASE
+)
+
+# Words that tend to appear when each extractor has something to find
+CUE_PATTERNS = {
+    "motivation": re.compile(
+        r"\b(want|wanna|need|because|cause|so that|hope|wish|goal|important|matters?|care|worr|afraid|scared|"
+        r"fear|tired of|sick of|health|energy|feel|felt|better|happier|kids|family|life|future|should|must|"
+        r"can't|cannot|struggl|hard|difficult|stress|motivat|reason|why|benefit|love|hate|like to|proud)",
+        re.IGNORECASE
+    ),
+    "plan": re.compile(
+        r"\b(will|i'll|going to|gonna|plan|tomorrow|tonight|next|start|begin|try|schedule|every|each|daily|"
+        r"weekly|morning|evening|night|week|month|commit|set|aim|decide|want to|by|until|before|after)\b|\d",
+        re.IGNORECASE
+    ),
+    "solution": re.compile(
+        r"\b(work|help|tried|trying|found|managed|able|success|effective|better|improv|easier|trick|tip|"
+        r"strategy|when i|whenever|after|before|instead|did|been|kept|today|yesterday|last)|\b\w+ed\b",
+        re.IGNORECASE
+    )
+}
+
+# Both solution extractors look for the same kind of message until their own models are trained
+CUE_PATTERNS["sft_solution"] = CUE_PATTERNS["solution"]
+
+_models = {}
+_models_loaded = False
+_models_lock = threading.Lock()
+_labels_lock = threading.Lock()
+
+_stats = {extractor: {"checked": 0, "skipped": 0, "ran": 0, "found": 0, "shadow_runs": 0, "false_negatives": 0}
+          for extractor in EXTRACTORS}
+_stats_lock = threading.Lock()
+
+def gate(extractor, message, previous_assistant_message=None):
+    """
+    Decide whether to run an extractor on a message
+    Returns "run", "shadow" (skipped by the gate but sampled to measure it) or None to skip.
+    """
+    if not INTENT_GATE_ENABLED:
+        return "run"
+
+    run = _could_fire(extractor, message, previous_assistant_message)
+
+    with _stats_lock:
+        _stats[extractor]["checked"] += 1
+        if not run:
+            _stats[extractor]["skipped"] += 1
+
+    if run:
+        return "run"
+    if random.random() < INTENT_GATE_SHADOW_RATE:
+        return "shadow"
+    return None
+
+def run_gated(extractor, func, message, *args):
+    """Call an extractor function if the gate lets it run, recording the outcome; returns None if skipped"""
+    decision = gate(extractor, message, *args)
+    if decision is None:
+        return None
+
+    result = func(message, *args)
+    record_outcome(extractor, message, decision, result)
+    return result
+
+async def run_gated_async(extractor, func, message, *args):
+    """Async version of run_gated for an async extractor function"""
+    decision = gate(extractor, message, *args)
+    if decision is None:
+        return None
+
+    result = await func(message, *args)
+    await asyncio.to_thread(record_outcome, extractor, message, decision, result)
+    return result
+
+def record_outcome(extractor, message, decision, result):
+    """Count an extractor's outcome and log it as training data for the gate's model"""
+    if not INTENT_GATE_ENABLED:
+        return
+
+    found = bool(result)
+    with _stats_lock:
+        stats = _stats[extractor]
+        if decision == "shadow":
+            stats["shadow_runs"] += 1
+            if found:
+                stats["false_negatives"] += 1
+        else:
+            stats["ran"] += 1
+            if found:
+                stats["found"] += 1
+
+    try:
+        with _labels_lock:
+            append_label(INTENT_LABELS_PATH, {"message": message, "extractor": extractor, "found": found},
+                         INTENT_LABELS_MAX_BYTES)
+    except OSError as e:
+        print(f"Error logging extractor outcome: {str(e)}")
+
+def get_gate_stats():
+    """Return per-extractor skip rates and the false-negative rate measured on shadow samples"""
+    with _stats_lock:
+        report = {}
+        for extractor, stats in _stats.items():
+            report[extractor] = {
+                **stats,
+                "skip_rate": stats["skipped"] / stats["checked"] if stats["checked"] else 0.0,
+                "false_negative_rate": stats["false_negatives"] / stats["shadow_runs"] if stats["shadow_runs"] else 0.0
+            }
+        return report
+
+def load_training_data(path=None):
+    """Read logged outcomes as {extractor: (messages, found)}, keeping the latest outcome per message"""
+    outcomes = {extractor: {} for extractor in EXTRACTORS}
+    for example in read_labels(path or INTENT_LABELS_PATH):
+        if example.get("extractor") in outcomes:
+            outcomes[example["extractor"]][example["message"]] = example["found"]
+
+    return {extractor: (list(found.keys()), list(found.values())) for extractor, found in outcomes.items()}
+
+def train_gate_model(extractor, messages, found):
+    """Fit an extractor's model to logged outcomes, save it and start using it"""
+    if not HAS_NUMPY:
+        raise RuntimeError("NumPy is required to train the intent gate")
+
+    model = train_model(messages, ["found" if f else "empty" for f in found], INTENT_GATE_FEATURES)
+    save_model(_model_path(extractor), model)
+    with _models_lock:
+        _get_models_locked()
+        _models[extractor] = model
+    return model
+
+def _could_fire(extractor, message, previous_assistant_message=None):
+    # Agreeing to the assistant's suggestions is how most plans get adopted
+    if extractor == "plan" and previous_assistant_message and is_plan_adoption(message):
+        return True
+
+    if SMALL_TALK_PATTERN.fullmatch(message):
+        return False
+
+    model = _get_model(extractor)
+    if model is not None:
+        return predict_proba(model, message).get("found", 0.0) >= INTENT_GATE_MIN_PROBABILITY
+
+    return CUE_PATTERNS[extractor].search(message) is not None
+
+def _model_path(extractor):
+    return os.path.join(INTENT_MODEL_DIR, f"intent_gate_{extractor}.npz")
+
+def _get_model(extractor):
+    if not HAS_NUMPY:
+        return None
+
+    with _models_lock:
+        return _get_models_locked().get(extractor)
+
+def _get_models_locked():
+    """Load every extractor's saved model on first use"""
+    global _models_loaded
+
+    if not _models_loaded:
+        _models_loaded = True
+        for extractor in EXTRACTORS:
+            model = load_model(_model_path(extractor))
+            if model is not None:
+                _models[extractor] = model
+    return _models
+
+if __name__ == "__main__":
+    for extractor, (messages, found) in load_training_data().items():
+        if len(messages) < MIN_TRAINING_EXAMPLES or len(set(found)) < 2:
+            print(f"{extractor}: need at least {MIN_TRAINING_EXAMPLES} logged messages with and without results, have {len(messages)}")
+            continue
+
+        train_gate_model(extractor, messages, found)
+        print(f"{extractor}: trained on {len(messages)} messages, saved to {_model_path(extractor)}")
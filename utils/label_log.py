@@ -0,0 +1,35 @@
+# label_log.py
+# JSON-lines logs of the labels the LLM gives messages (stage classifications, extractor outcomes),
+# kept as training data for the local models. Each log is capped: once it would pass its byte limit
+# it is renamed to <path>.1, replacing the previous one, and a new log is started, so at most twice
+# the limit of messages is kept on disk. A limit of 0 turns logging off.
+import os
+import json
+
+def append_label(path, record, max_bytes):
+    """Append a record to a label log, rotating the log first if the record would take it past max_bytes"""
+    if max_bytes <= 0:
+        return
+
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    try:
+        if os.path.getsize(path) + len(line.encode("utf-8")) > max_bytes:
+            os.replace(path, f"{path}.1")
+    except FileNotFoundError:
+        pass
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line)
+
+def read_labels(path):
+    """Yield the records of a label log oldest first, from the rotated log and then the current one"""
+    for log_path in (f"{path}.1", path):
+        try:
+            with open(log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            continue
@@ -0,0 +1,82 @@
+# linear_model.py
+# Multinomial logistic regression over hashed text features, shared by the local text models.
+# A model is a dictionary with "weights" (buckets x labels), "bias" and "labels". NumPy is an
+# optional dependency: callers check HAS_NUMPY and fall back to the LLM without it.
+from utils.text_features import hashed_features
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY = np is not None
+
+def predict_proba(model, text):
+    """Return a dictionary of label to probability for a text"""
+    features = hashed_features(text, model["weights"].shape[0])
+    logits = model["bias"].copy()
+    if features:
+        indices = np.fromiter(features.keys(), dtype=np.int64)
+        values = np.fromiter(features.values(), dtype=np.float64)
+        logits += values @ model["weights"][indices]
+
+    return dict(zip(model["labels"], softmax(logits).tolist()))
+
+def train_model(texts, labels, dim, epochs=300, learning_rate=1.0, l2=1e-4):
+    """Fit a model to labelled texts with full-batch gradient descent"""
+    label_names = sorted(set(labels))
+    label_index = {label: i for i, label in enumerate(label_names)}
+    n, k = len(texts), len(label_names)
+
+    # Sparse design matrix as coordinate lists
+    rows, cols, values = [], [], []
+    for row, text in enumerate(texts):
+        for col, value in hashed_features(text, dim).items():
+            rows.append(row)
+            cols.append(col)
+            values.append(value)
+    rows = np.array(rows, dtype=np.int64)
+    cols = np.array(cols, dtype=np.int64)
+    values = np.array(values, dtype=np.float64)
+
+    targets = np.zeros((n, k))
+    targets[np.arange(n), [label_index[label] for label in labels]] = 1.0
+
+    weights = np.zeros((dim, k))
+    bias = np.zeros(k)
+    for _ in range(epochs):
+        logits = np.tile(bias, (n, 1))
+        np.add.at(logits, rows, values[:, None] * weights[cols])
+        errors = (softmax(logits) - targets) / n
+
+        gradient = np.zeros_like(weights)
+        np.add.at(gradient, cols, values[:, None] * errors[rows])
+        weights -= learning_rate * (gradient + l2 * weights)
+        bias -= learning_rate * errors.sum(axis=0)
+
+    return {"weights": weights, "bias": bias, "labels": label_names}
+
+def save_model(path, model):
+    np.savez_compressed(path, weights=model["weights"], bias=model["bias"], labels=np.array(model["labels"]))
+
+def load_model(path):
+    """Load a saved model, or return None if there is none or NumPy is unavailable"""
+    if np is None:
+        return None
+
+    try:
+        with np.load(path) as saved:
+            return {
+                "weights": saved["weights"],
+                "bias": saved["bias"],
+                "labels": [str(label) for label in saved["labels"]]
+            }
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error loading model {path}: {str(e)}")
+        return None
+
+def softmax(logits):
+    shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
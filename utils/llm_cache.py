@@ -0,0 +1,239 @@
+# llm_cache.py
+# Cache for the helper calls (stage classification, extractors, simplification) whose output only
+# depends on their request. Responses are keyed by a hash of the whole request, kept in a bounded
+# in-memory LRU and in a content-addressed directory on disk, so they also survive restarts. The
+# directory is pruned in the background as responses are stored, so it stays bounded too.
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+
+from utils.openai_client import record_usage
+
+# Set LLM_CACHE=0 to always call the API
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+
+# Number of responses kept in memory and how long a cached response stays valid, in seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Directory of the on-disk store: one small JSON file per response, named by its key
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(os.path.dirname(__file__), "llm_cache"))
+
+# Most responses kept on disk, and how many new responses are stored between prunes of the
+# directory, which drop expired entries and then the oldest ones over the cap
+LLM_CACHE_MAX_DISK_ENTRIES = int(os.getenv("LLM_CACHE_MAX_DISK_ENTRIES", "20000"))
+LLM_CACHE_PRUNE_EVERY = int(os.getenv("LLM_CACHE_PRUNE_EVERY", "500"))
+
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+
+# Stores since the last prune; starts at the threshold so the first store prunes what earlier runs left
+_stores_since_prune = LLM_CACHE_PRUNE_EVERY
+_pruning = False
+
+_stats = {
+    "memory_hits": 0,
+    "disk_hits": 0,
+    "misses": 0,
+    "disk_pruned": 0
+}
+
+def cache_key(request):
+    """Hash a chat completion request (model, messages, response format...) into a cache key"""
+    canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def cached_completion(client, request):
+    """Return the message content for a chat completion request, calling the API only on a cache miss"""
+    return cached_completion_hit(client, request)[0]
+
+def cached_completion_hit(client, request):
+    """Like cached_completion, but returns (content, hit), hit being True if the response came from the cache"""
+    if not LLM_CACHE_ENABLED:
+        return _create(client, request), False
+
+    key = cache_key(request)
+    content = _lookup(key)
+    if content is not None:
+        return content, True
+
+    content = _create(client, request)
+    _store(key, content)
+    return content, False
+
+async def cached_completion_async(client, request):
+    """Async version of cached_completion; disk access runs in a worker thread"""
+    return (await cached_completion_hit_async(client, request))[0]
+
+async def cached_completion_hit_async(client, request):
+    """Async version of cached_completion_hit"""
+    if not LLM_CACHE_ENABLED:
+        return await _create_async(client, request), False
+
+    key = cache_key(request)
+    content = _memory_lookup(key)
+    if content is None:
+        content = await asyncio.to_thread(_disk_lookup, key)
+    if content is not None:
+        return content, True
+
+    _count("misses")
+    content = await _create_async(client, request)
+    await asyncio.to_thread(_store, key, content)
+    return content, False
+
+def _create(client, request):
+    started = time.monotonic()
+    response = client.chat.completions.create(**request)
+    record_usage(response.usage, time.monotonic() - started)
+    return response.choices[0].message.content
+
+async def _create_async(client, request):
+    started = time.monotonic()
+    response = await client.chat.completions.create(**request)
+    record_usage(response.usage, time.monotonic() - started)
+    return response.choices[0].message.content
+
+def get_cache_stats():
+    """Return hit and miss counters for the helper call cache"""
+    with _memory_lock:
+        lookups = _stats["memory_hits"] + _stats["disk_hits"] + _stats["misses"]
+        hits = lookups - _stats["misses"]
+        return {
+            **_stats,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(_memory)
+        }
+
+def _count(counter):
+    with _memory_lock:
+        _stats[counter] += 1
+
+def _lookup(key):
+    content = _memory_lookup(key)
+    if content is None:
+        content = _disk_lookup(key)
+    if content is None:
+        _count("misses")
+    return content
+
+def _memory_lookup(key):
+    with _memory_lock:
+        entry = _memory.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > LLM_CACHE_TTL:
+            del _memory[key]
+            return None
+
+        _memory.move_to_end(key)
+        _stats["memory_hits"] += 1
+        return entry[1]
+
+def _remember(key, created_at, content):
+    with _memory_lock:
+        _memory[key] = (created_at, content)
+        _memory.move_to_end(key)
+        while len(_memory) > LLM_CACHE_MAX_ENTRIES:
+            _memory.popitem(last=False)
+
+def _disk_path(key):
+    return os.path.join(LLM_CACHE_DIR, key[:2], f"{key}.json")
+
+def _disk_lookup(key):
+    path = _disk_path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if time.time() - entry["created_at"] > LLM_CACHE_TTL:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+    _remember(key, entry["created_at"], entry["content"])
+    _count("disk_hits")
+    return entry["content"]
+
+def _store(key, content):
+    """Keep a response in memory and on disk; failures to write the disk copy are not fatal"""
+    if content is None:
+        return
+
+    created_at = time.time()
+    _remember(key, created_at, content)
+
+    path = _disk_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write under a unique name and rename, so a reader never sees a partial entry
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created_at": created_at, "content": content}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error writing LLM cache entry: {str(e)}")
+
+    _maybe_prune()
+
+def _maybe_prune():
+    """Prune the disk store in a background thread every LLM_CACHE_PRUNE_EVERY stores, one prune at a time"""
+    global _stores_since_prune, _pruning
+
+    with _memory_lock:
+        _stores_since_prune += 1
+        if _pruning or _stores_since_prune < LLM_CACHE_PRUNE_EVERY:
+            return
+        _stores_since_prune = 0
+        _pruning = True
+
+    threading.Thread(target=prune_disk_cache, name="llm-cache-prune", daemon=True).start()
+
+def prune_disk_cache():
+    """Delete expired and leftover temporary entries, then the oldest entries over LLM_CACHE_MAX_DISK_ENTRIES; returns how many were deleted"""
+    global _pruning
+
+    try:
+        now = time.time()
+        entries = []
+        removed = 0
+        for directory, _, names in os.walk(LLM_CACHE_DIR):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    # An entry's file is written once, so its mtime is when it was cached
+                    modified = os.stat(path).st_mtime
+                    if now - modified > LLM_CACHE_TTL or (name.endswith(".tmp") and now - modified > 3600):
+                        os.remove(path)
+                        removed += 1
+                    elif name.endswith(".json"):
+                        entries.append((modified, path))
+                except OSError:
+                    continue
+
+        if len(entries) > LLM_CACHE_MAX_DISK_ENTRIES:
+            entries.sort()
+            for _, path in entries[:len(entries) - LLM_CACHE_MAX_DISK_ENTRIES]:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    continue
+
+        with _memory_lock:
+            _stats["disk_pruned"] += removed
+        return removed
+    except Exception as e:
+        print(f"Error pruning LLM cache: {str(e)}")
+        return 0
+    finally:
+        with _memory_lock:
+            _pruning = False
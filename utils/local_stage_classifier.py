@@ -0,0 +1,132 @@
+# local_stage_classifier.py
+# A small on-CPU stage classifier that answers before the LLM classifier is asked. It is a
+# multinomial logistic regression over hashed n-gram features (utils/text_features.py), trained on
+# the labels the LLM classifier has given, which are logged as it runs (in a log capped at
+# STAGE_LABELS_MAX_BYTES, see utils/label_log.py). NumPy is optional: without it, or before a
+# model has been trained, every message goes to the LLM.
+#
+# Train or retrain the model with: python -m utils.local_stage_classifier
+import os
+import threading
+
+from utils.label_log import append_label, read_labels
+from utils.linear_model import HAS_NUMPY, predict_proba, train_model, save_model, load_model
+
+# Set LOCAL_STAGE_CLASSIFIER=0 to always use the LLM classifier
+LOCAL_STAGE_CLASSIFIER_ENABLED = os.getenv("LOCAL_STAGE_CLASSIFIER", "1") != "0"
+
+# Predictions below this probability fall back to the LLM classifier
+LOCAL_STAGE_MIN_CONFIDENCE = float(os.getenv("LOCAL_STAGE_MIN_CONFIDENCE", "0.8"))
+
+# Number of hashed feature buckets
+LOCAL_STAGE_FEATURES = int(os.getenv("LOCAL_STAGE_FEATURES", str(2 ** 16)))
+
+# Where LLM labels are logged and where the trained model is saved
+STAGE_LABELS_PATH = os.getenv("STAGE_LABELS_PATH", os.path.join(os.path.dirname(__file__), "stage_labels.jsonl"))
+STAGE_MODEL_PATH = os.getenv("STAGE_MODEL_PATH", os.path.join(os.path.dirname(__file__), "stage_model.npz"))
+
+# Bytes the label log may grow to before it is rotated; 0 stops logging the users' messages
+STAGE_LABELS_MAX_BYTES = int(os.getenv("STAGE_LABELS_MAX_BYTES", str(5 * 1024 * 1024)))
+
+# Fewest distinct labelled messages worth training on
+MIN_TRAINING_EXAMPLES = 50
+
+_model = None
+_model_loaded = False
+_model_lock = threading.Lock()
+_labels_lock = threading.Lock()
+
+_stats = {
+    "local": 0,
+    "fallback": 0
+}
+_stats_lock = threading.Lock()
+
+def predict_stage(message):
+    """
+    Classify a message with the local model
+    Returns (stage, confidence), or (None, 0.0) if no model is available.
+    """
+    model = _get_model()
+    if model is None:
+        return None, 0.0
+
+    probabilities = predict_proba(model, message)
+    stage = max(probabilities, key=probabilities.get)
+    return stage, probabilities[stage]
+
+def confident_stage(message):
+    """Return the local model's stage if it is confident enough to skip the LLM, otherwise None"""
+    if not LOCAL_STAGE_CLASSIFIER_ENABLED:
+        return None
+
+    stage, confidence = predict_stage(message)
+    confident = stage is not None and confidence >= LOCAL_STAGE_MIN_CONFIDENCE
+
+    with _stats_lock:
+        _stats["local" if confident else "fallback"] += 1
+    return stage if confident else None
+
+def record_label(message, stage):
+    """Log a stage the LLM classifier gave a message, as training data for the local model"""
+    if not LOCAL_STAGE_CLASSIFIER_ENABLED or not message or not stage:
+        return
+
+    try:
+        with _labels_lock:
+            append_label(STAGE_LABELS_PATH, {"message": message, "stage": stage}, STAGE_LABELS_MAX_BYTES)
+    except OSError as e:
+        print(f"Error logging stage label: {str(e)}")
+
+def get_stage_classifier_stats():
+    """Return how many messages the local model classified and how many fell back to the LLM"""
+    with _stats_lock:
+        total = _stats["local"] + _stats["fallback"]
+        return {
+            **_stats,
+            "local_rate": _stats["local"] / total if total else 0.0,
+            "model_loaded": _get_model() is not None
+        }
+
+def load_training_data(path=None):
+    """Read logged labels as (messages, stages), keeping the latest label for each distinct message"""
+    labels = {}
+    for example in read_labels(path or STAGE_LABELS_PATH):
+        labels[example["message"]] = example["stage"]
+
+    return list(labels.keys()), list(labels.values())
+
+def train_stage_model(messages, stages):
+    """Fit the model to labelled messages, save it and start using it"""
+    global _model, _model_loaded
+
+    if not HAS_NUMPY:
+        raise RuntimeError("NumPy is required to train the local stage classifier")
+
+    model = train_model(messages, stages, LOCAL_STAGE_FEATURES)
+    save_model(STAGE_MODEL_PATH, model)
+    with _model_lock:
+        _model = model
+        _model_loaded = True
+    return model
+
+def _get_model():
+    """Load the saved model on first use; None if it is disabled, missing or NumPy is unavailable"""
+    global _model, _model_loaded
+
+    if not HAS_NUMPY or not LOCAL_STAGE_CLASSIFIER_ENABLED:
+        return None
+
+    with _model_lock:
+        if not _model_loaded:
+            _model_loaded = True
+            _model = load_model(STAGE_MODEL_PATH)
+        return _model
+
+if __name__ == "__main__":
+    messages, stages = load_training_data()
+    if len(messages) < MIN_TRAINING_EXAMPLES or len(set(stages)) < 2:
+        print(f"Need at least {MIN_TRAINING_EXAMPLES} labelled messages covering two stages, have {len(messages)}")
+    else:
+        train_stage_model(messages, stages)
+        print(f"Trained on {len(messages)} messages, saved to {STAGE_MODEL_PATH}")
@@ -0,0 +1,154 @@
+# near_duplicates.py
+# Write-time detection of near-duplicate motivations, plans and solutions, so a goal stores each
+# idea once however often the user repeats it. An item's text is reduced to a set of crudely
+# stemmed content words ("wants more energy" and "wants to feel more energetic" share "want" and
+# "energ"), and two items are near duplicates when the Jaccard similarity of their sets reaches
+# DUPLICATE_SIMILARITY, the shorter set is contained in the longer one if it has no more than
+# SHORT_STEM_SET stems, and both name the same quantities and times ("walk 10 min after dinner"
+# is not "walk 30 min after dinner"). A repeat is merged into the stored item, so anything looser
+# would lose what the user said. Each goal's lists get an inverted index from stem to items, so only items
+# sharing one of the new text's rarest stems are compared. Indexes are kept per user in memory and, since
+# items are only ever appended, catch up by indexing just the items added since they were last used.
+import os
+import math
+import threading
+
+from utils.goal_views import normalize
+from utils.retrieval import STOPWORDS
+from utils.session_store import SessionStore
+
+# Jaccard similarity of two items' stems at which the newer one counts as a repeat
+DUPLICATE_SIMILARITY = float(os.getenv("DUPLICATE_SIMILARITY", "0.6"))
+
+# Stem sets this small only match a set that contains them, since one differing word is most of the text
+SHORT_STEM_SET = int(os.getenv("DUPLICATE_SHORT_STEM_SET", "4"))
+
+# Words that name an amount, a day or a time of day; two texts that differ in any of these say different things
+QUANTITY_WORDS = {
+    "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "eleven", "twelve",
+    "fifteen", "twenty", "thirty", "forty", "fifty", "sixty", "hundred", "half", "quarter", "once", "twice",
+    "am", "pm", "noon", "midnight", "morning", "afternoon", "evening", "night", "tonight", "today", "tomorrow",
+    "weekday", "weekend", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "daily", "weekly", "monthly", "before", "after"
+}
+
+# Texts each kind of item is compared on
+ITEM_TEXT = {
+    "motivations": lambda item: item["content"],
+    "plans": lambda item: item["action"],
+    "solutions": lambda item: item["description"]
+}
+
+# Suffixes stripped before a word is cut to STEM_LENGTH characters
+SUFFIXES = ("ing", "ed", "ly", "es", "s")
+STEM_LENGTH = 5
+
+_indexes = SessionStore()
+_indexes_lock = threading.Lock()
+
+class DuplicateIndex:
+    """Stem sets and a stem -> rows inverted index for an append-only list of items"""
+
+    def __init__(self, text_of):
+        self.text_of = text_of
+        self.stems = []
+        self.quantities = []
+        self.postings = {}
+        self.keys = []
+
+    def sync(self, items):
+        """Index items added since the last sync, or re-index everything if the list was rewritten"""
+        count = len(self.keys)
+        if len(items) < count or (count and self._key(items[count - 1]) != self.keys[-1]):
+            self.stems, self.quantities, self.postings, self.keys = [], [], {}, []
+            count = 0
+
+        for row, item in enumerate(items[count:], start=count):
+            stems = stem_set(self.text_of(item))
+            self.stems.append(stems)
+            self.quantities.append(quantity_set(self.text_of(item)))
+            self.keys.append(self._key(item))
+            for stem in stems:
+                self.postings.setdefault(stem, []).append(row)
+
+    def find(self, items, text, accept=None):
+        """Return the existing item most similar to text if it is a near duplicate (and accept(item) holds), else None"""
+        stems = stem_set(text)
+        if not stems:
+            return None
+        quantities = quantity_set(text)
+
+        # An item with a Jaccard similarity of at least t shares at least t * len(stems) of the stems, so
+        # it must contain one of the rarest len(stems) - ceil(t * len(stems)) + 1; only those are probed
+        probe = len(stems) - math.ceil(DUPLICATE_SIMILARITY * len(stems)) + 1
+        rarest = sorted(stems, key=lambda stem: len(self.postings.get(stem, ())))[:max(probe, 1)]
+
+        best, best_similarity = None, DUPLICATE_SIMILARITY
+        candidates = {row for stem in rarest for row in self.postings.get(stem, ())}
+        for row in candidates:
+            if accept is not None and not accept(items[row]):
+                continue
+            similarity = jaccard(stems, self.stems[row])
+            if not is_repeat(stems, self.stems[row], quantities, self.quantities[row], similarity):
+                continue
+            # Ties go to the newer item
+            if similarity > best_similarity or (similarity == best_similarity and (best is None or row > best)):
+                best, best_similarity = row, similarity
+        return items[best] if best is not None else None
+
+    def _key(self, item):
+        return (item.get("id"), self.text_of(item))
+
+def stem(word):
+    """Strip a common suffix and cut a word to STEM_LENGTH characters, so word forms compare equal"""
+    if any(char.isdigit() for char in word):
+        # "10pm" and "11pm" are different times
+        return word
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    return word[:STEM_LENGTH]
+
+def stem_set(text):
+    """Return the stems of a text's content words"""
+    return frozenset(stem(word) for word in normalize(text).split() if len(word) > 1 and word not in STOPWORDS)
+
+def quantity_set(text):
+    """Return the numbers, number words and day and time words in a text"""
+    return frozenset(word for word in normalize(text).split()
+                     if word in QUANTITY_WORDS or any(char.isdigit() for char in word))
+
+def is_repeat(stems, other_stems, quantities, other_quantities, similarity=None):
+    """Whether two texts, given as stem and quantity sets, say the same thing"""
+    if quantities != other_quantities:
+        return False
+    similarity = jaccard(stems, other_stems) if similarity is None else similarity
+    if similarity < DUPLICATE_SIMILARITY:
+        return False
+    shorter, longer = sorted((stems, other_stems), key=len)
+    return len(shorter) > SHORT_STEM_SET or shorter <= longer
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+def find_duplicate(user_id, goal, collection, text, accept=None):
+    """
+    Return the item in one of a goal's lists that text repeats, or None if text is a new idea
+    Only items for which accept(item) holds are considered, if accept is given.
+    """
+    with _indexes_lock:
+        indexes = _indexes.get(user_id)
+        if indexes is None:
+            indexes = {"lock": threading.Lock(), "goals": {}}
+            _indexes[user_id] = indexes
+
+    with indexes["lock"]:
+        goal_indexes = indexes["goals"].setdefault(goal["id"], {})
+        index = goal_indexes.get(collection)
+        if index is None:
+            index = goal_indexes[collection] = DuplicateIndex(ITEM_TEXT[collection])
+
+        items = goal.get(collection, [])
+        index.sync(items)
+        return index.find(items, text, accept)
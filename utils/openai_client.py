@@ -0,0 +1,173 @@
+# openai_client.py
+# One place that builds the OpenAI clients every module uses, so all calls share one keep-alive
+# connection pool with the same timeouts, retry policy and pool limits
+import os
+import threading
+import time
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+from dotenv import load_dotenv
+
+# Make sure the API key in .env is visible whichever module imports the client first
+load_dotenv()
+
+# Timeouts in seconds
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", "60"))
+
+# Retries use the SDK's exponential backoff with jitter on connection errors, 408, 409, 429 and 5xx
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+# Connection pool limits
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+_stats = {
+    "requests": 0,
+    "in_flight": 0,
+    "responses_by_status": {},
+    "total_latency": 0.0,
+    "max_latency": 0.0
+}
+_stats_lock = threading.Lock()
+
+# Prompt tokens of completed calls and how many the provider served from its prompt cache, with
+# latency split by whether any of the prompt was cached
+_usage = {
+    "completions": 0,
+    "prompt_tokens": 0,
+    "cached_tokens": 0,
+    "cache_hits": 0,
+    "hit_latency": 0.0,
+    "miss_latency": 0.0
+}
+
+def _timeout():
+    return httpx.Timeout(OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+
+def _limits():
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+    )
+
+def _request_started():
+    """Record the start of an outbound request and return its start time"""
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["in_flight"] += 1
+    return time.monotonic()
+
+def _request_finished(started, status):
+    """Record the outcome and latency of an outbound request"""
+    latency = time.monotonic() - started
+    with _stats_lock:
+        _stats["in_flight"] -= 1
+        _stats["responses_by_status"][status] = _stats["responses_by_status"].get(status, 0) + 1
+        _stats["total_latency"] += latency
+        _stats["max_latency"] = max(_stats["max_latency"], latency)
+
+class _InstrumentedTransport(httpx.HTTPTransport):
+    """Connection-pooling transport that counts requests, statuses and latency (time to response headers)"""
+
+    def handle_request(self, request):
+        started = _request_started()
+        try:
+            response = super().handle_request(request)
+        except Exception:
+            _request_finished(started, "error")
+            raise
+        _request_finished(started, str(response.status_code))
+        return response
+
+class _InstrumentedAsyncTransport(httpx.AsyncHTTPTransport):
+    """Async version of _InstrumentedTransport"""
+
+    async def handle_async_request(self, request):
+        started = _request_started()
+        try:
+            response = await super().handle_async_request(request)
+        except Exception:
+            _request_finished(started, "error")
+            raise
+        _request_finished(started, str(response.status_code))
+        return response
+
+def get_client():
+    """Return the OpenAI client shared by every sync code path"""
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = OpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                timeout=_timeout(),
+                max_retries=OPENAI_MAX_RETRIES,
+                http_client=DefaultHttpxClient(transport=_InstrumentedTransport(limits=_limits()))
+            )
+
+    return _client
+
+def get_async_client():
+    """Return the AsyncOpenAI client shared by every async code path"""
+    global _async_client
+
+    with _client_lock:
+        if _async_client is None:
+            _async_client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                timeout=_timeout(),
+                max_retries=OPENAI_MAX_RETRIES,
+                http_client=DefaultAsyncHttpxClient(transport=_InstrumentedAsyncTransport(limits=_limits()))
+            )
+
+    return _async_client
+
+def record_usage(usage, latency):
+    """Record a completion's prompt tokens, the share served from the prompt cache, and its latency"""
+    if usage is None:
+        return
+    
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) or 0
+    with _stats_lock:
+        _usage["completions"] += 1
+        _usage["prompt_tokens"] += usage.prompt_tokens or 0
+        _usage["cached_tokens"] += cached_tokens
+        if cached_tokens:
+            _usage["cache_hits"] += 1
+            _usage["hit_latency"] += latency
+        else:
+            _usage["miss_latency"] += latency
+
+def get_client_stats():
+    """Return counters for outbound OpenAI requests made through the shared clients"""
+    with _stats_lock:
+        completed = sum(_stats["responses_by_status"].values())
+        return {
+            "requests": _stats["requests"],
+            "in_flight": _stats["in_flight"],
+            "responses_by_status": dict(_stats["responses_by_status"]),
+            "average_latency": _stats["total_latency"] / completed if completed else 0.0,
+            "max_latency": _stats["max_latency"],
+            "prompt_cache": _prompt_cache_stats()
+        }
+
+def _prompt_cache_stats():
+    completions = _usage["completions"]
+    misses = completions - _usage["cache_hits"]
+    return {
+        "completions": completions,
+        "prompt_tokens": _usage["prompt_tokens"],
+        "cached_tokens": _usage["cached_tokens"],
+        "cached_token_rate": _usage["cached_tokens"] / _usage["prompt_tokens"] if _usage["prompt_tokens"] else 0.0,
+        "hit_rate": _usage["cache_hits"] / completions if completions else 0.0,
+        "average_hit_latency": _usage["hit_latency"] / _usage["cache_hits"] if _usage["cache_hits"] else 0.0,
+        "average_miss_latency": _usage["miss_latency"] / misses if misses else 0.0
+    }
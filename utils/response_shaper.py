@@ -0,0 +1,124 @@
+# response_shaper.py
+# Cuts a reply down to one question and at most RESPONSE_MAX_SENTENCES sentences without another
+# API call. The reply is split into sentences, the most salient question is kept (open questions
+# score higher, fragments and questions opening with "Or"/"And"/"So" score far lower, and later
+# questions win ties) and the other questions are dropped, and the remaining sentences are trimmed
+# from the end. Replies the splitter can't take apart cleanly, or whose kept question leans on a
+# dropped one, are left for the LLM editor in chat_controller.
+import os
+import re
+import threading
+
+# Sentences a shaped reply may have, counting its question
+RESPONSE_MAX_SENTENCES = int(os.getenv("RESPONSE_MAX_SENTENCES", "5"))
+
+# A sentence ends at . ! ? (or an ellipsis), optionally followed by closing quotes or brackets,
+# where the next sentence starts with a capital, digit or opening quote; line breaks always end one
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])[\"'”’)\]]*[ \t]+(?=[\"'“‘(\[]?[A-Z0-9])|[ \t]*\n+[ \t]*")
+
+# Numbers and bullets that start list items; they are dropped, since the kept sentences are rejoined as prose
+LIST_MARKER = re.compile(r"(\d+[.)]|[-*•])\s+")
+
+# Words whose trailing period doesn't end a sentence
+ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "st", "vs", "etc", "e.g", "i.e", "approx", "min", "hr", "hrs"}
+
+OPEN_QUESTION_PATTERN = re.compile(r"\W*(what|how|why|which|where|when|who|tell me|describe)\b", re.IGNORECASE)
+# Questions that lean on the one before them: "Or would you rather...?", "And then?", "So?"
+DEPENDENT_QUESTION_PATTERN = re.compile(r"\W*(or|and|so|but|then)\b", re.IGNORECASE)
+
+YES_NO_QUESTION_PATTERN = re.compile(
+    r"\W*(do|does|did|are|is|was|were|would|could|can|have|has|will|should|shall)\b", re.IGNORECASE
+)
+
+_stats = {
+    "responses": 0,
+    "shaped": 0,
+    "unshaped": 0
+}
+_stats_lock = threading.Lock()
+
+def split_sentences(text):
+    """Split a reply into its sentences, keeping each sentence's own punctuation"""
+    sentences = []
+    start = 0
+    for boundary in SENTENCE_BOUNDARY.finditer(text):
+        if boundary.start() < start:
+            continue
+        if "\n" not in boundary.group():
+            # "Dr. Smith", "e.g. Monday" and list markers run on
+            marker = LIST_MARKER.match(text, start)
+            if marker and marker.end() >= boundary.end():
+                continue
+            sentence = text[start:boundary.start()].strip()
+            if sentence.endswith(".") and sentence.rsplit(None, 1)[-1].rstrip(".").lower() in ABBREVIATIONS:
+                continue
+        _add_sentence(sentences, text[start:boundary.start()])
+        start = boundary.end()
+
+    _add_sentence(sentences, text[start:])
+    return sentences
+
+def _add_sentence(sentences, text):
+    sentence = text.strip()
+    marker = LIST_MARKER.match(sentence)
+    if marker:
+        sentence = sentence[marker.end():]
+    if sentence:
+        sentences.append(sentence)
+
+def is_question(sentence):
+    return sentence.rstrip("\"'”’)] ").endswith("?")
+
+def is_dependent_question(sentence):
+    """Whether a question only makes sense after another one: it opens with a conjunction or is a fragment"""
+    return bool(DEPENDENT_QUESTION_PATTERN.match(sentence)) or len(sentence.split()) < 3
+
+def question_salience(sentence, position, count):
+    """Score a question: open questions beat yes/no ones, fragments lose, and later questions win ties"""
+    score = 0.1 * position / max(count - 1, 1)
+    if OPEN_QUESTION_PATTERN.match(sentence):
+        score += 1.0
+    elif YES_NO_QUESTION_PATTERN.match(sentence):
+        score += 0.25
+    if re.search(r"\byou(r)?\b", sentence, re.IGNORECASE):
+        score += 0.25
+    if is_dependent_question(sentence):
+        score -= 2.0
+    return score
+
+def shape_response(text, max_sentences=None):
+    """
+    Keep a reply's most salient question and trim it to max_sentences sentences
+    Returns the shaped reply, or None if the reply can't be split into sentences and cut down reliably.
+    """
+    max_sentences = max_sentences or RESPONSE_MAX_SENTENCES
+    sentences = split_sentences(text)
+    questions = [i for i, sentence in enumerate(sentences) if is_question(sentence)]
+
+    shaped = None
+    # A question mark left inside a sentence means the split missed a boundary (quotes, lists)
+    if questions and all(sentence.count("?") <= 1 for sentence in sentences):
+        keep = max(questions, key=lambda i: question_salience(sentences[i], questions.index(i), len(questions)))
+
+        # Statements come first in replies (validation, reflection), so the earliest ones are kept
+        statements = [i for i, sentence in enumerate(sentences) if i not in questions]
+        kept = sorted(statements[:max_sentences - 1] + [keep])
+        shaped = " ".join(sentences[i] for i in kept)
+
+        # A question that needs a dropped one to make sense, or a question still quoted in a
+        # statement, means the reply can't be cut down safely here
+        if (len(questions) > 1 and is_dependent_question(sentences[keep])) or shaped.count("?") > 1:
+            shaped = None
+
+    with _stats_lock:
+        _stats["responses"] += 1
+        _stats["shaped" if shaped is not None else "unshaped"] += 1
+    return shaped
+
+def get_shaper_stats():
+    """Return how many multi-question replies were shaped locally and how many were left for the LLM"""
+    with _stats_lock:
+        return {
+            **_stats,
+            "fallback_rate": _stats["unshaped"] / _stats["responses"] if _stats["responses"] else 0.0
+        }
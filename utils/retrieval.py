@@ -0,0 +1,176 @@
+# retrieval.py
+# Local retrieval of the solutions, plans and motivations most relevant to a message. Each list
+# of items gets a NumPy matrix of hashed term vectors (utils/text_features.py, stopwords left out),
+# one unit-length row per item, and a query is one matrix-vector product for cosine similarity.
+# The best matches are then weighted by effectiveness and recency. Items are only ever appended,
+# so an index embeds just the items added since it was last used. NumPy is optional: without it
+# retrieval returns None and callers keep their recency-based picks.
+import os
+import threading
+
+from utils.text_features import hashed_features
+from utils.goal_views import effectiveness_score
+from utils.session_store import SessionStore
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY = np is not None
+
+# Number of hashed feature buckets per vector
+RETRIEVAL_FEATURES = int(os.getenv("RETRIEVAL_FEATURES", "1024"))
+
+# Cosine similarity an item needs to count as relevant to a message
+RETRIEVAL_MIN_SIMILARITY = float(os.getenv("RETRIEVAL_MIN_SIMILARITY", "0.15"))
+
+# Users whose goal indexes are kept in memory; others are rebuilt on their next message
+RETRIEVAL_MAX_USERS = int(os.getenv("RETRIEVAL_MAX_USERS", "1000"))
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "if", "so", "to", "of", "in", "on", "at", "for", "with", "by",
+    "from", "about", "as", "into", "it", "its", "it's", "is", "am", "are", "was", "were", "be", "been",
+    "being", "i", "i'm", "i've", "i'll", "me", "my", "we", "our", "you", "your", "he", "she", "they",
+    "them", "this", "that", "these", "those", "there", "here", "do", "does", "did", "have", "has", "had",
+    "will", "would", "can", "could", "should", "just", "really", "very", "what", "when", "how", "not",
+    "no", "yes", "some", "any", "all", "more", "too", "also", "then", "than", "up", "out", "get", "got"
+}
+
+GOAL_COLLECTIONS = ("solutions", "plans", "motivations")
+
+# Texts each kind of item is matched on
+ITEM_TEXT = {
+    "solutions": lambda item: f"{item.get('habit', '')} {item['description']}",
+    "plans": lambda item: item["action"],
+    "motivations": lambda item: item["content"]
+}
+
+_goal_indexes = SessionStore(max_users=RETRIEVAL_MAX_USERS)
+_goal_indexes_lock = threading.Lock()
+_solutions_db_index = None
+_solutions_db_lock = threading.Lock()
+
+class ListIndex:
+    """Vectors for an append-only list of items, row i holding item i"""
+
+    def __init__(self, text_of):
+        self.text_of = text_of
+        # Sized on first use to the items there are, so an empty or small list costs next to nothing
+        self.matrix = np.zeros((0, RETRIEVAL_FEATURES), dtype=np.float32)
+        self.ids = []
+
+    def sync(self, items):
+        """Embed items added since the last sync, or re-embed everything if the list was rewritten"""
+        count = len(self.ids)
+        if len(items) < count or (count and items[count - 1].get("id") != self.ids[-1]):
+            self.ids = []
+            count = 0
+
+        if len(items) > self.matrix.shape[0]:
+            # Grow by doubling, so appends stay cheap
+            matrix = np.zeros((max(len(items), 2 * self.matrix.shape[0]), RETRIEVAL_FEATURES), dtype=np.float32)
+            matrix[:count] = self.matrix[:count]
+            self.matrix = matrix
+
+        for row, item in enumerate(items[count:], start=count):
+            self.matrix[row] = embed(self.text_of(item))
+            self.ids.append(item.get("id"))
+
+    def search(self, items, query, k, weight, rows=None, min_similarity=None):
+        """
+        Return up to k (item, score) pairs for the items most similar to a query vector, optionally
+        only among the given rows. The score is the cosine similarity times weight(item, row, count),
+        and a weight of 0 drops the item.
+        """
+        count = len(self.ids)
+        if rows is None:
+            rows = np.arange(count)
+        if not count or not len(rows):
+            return []
+        min_similarity = RETRIEVAL_MIN_SIMILARITY if min_similarity is None else min_similarity
+
+        similarities = self.matrix[rows] @ query if len(rows) < count else self.matrix[:count] @ query
+        # Only the best few are weighted, which is what keeps a search fast at thousands of rows
+        candidates = min(len(rows), 8 * k)
+        best = np.argpartition(-similarities, candidates - 1)[:candidates]
+
+        results = []
+        for position in best:
+            row = int(rows[position])
+            similarity = float(similarities[position])
+            if similarity < min_similarity:
+                continue
+            item_weight = weight(items[row], row, count)
+            if item_weight > 0:
+                results.append((items[row], similarity * item_weight))
+
+        results.sort(key=lambda result: -result[1])
+        return results[:k]
+
+def embed(text):
+    """Return a text's hashed term vector as a unit-length NumPy array"""
+    vector = np.zeros(RETRIEVAL_FEATURES, dtype=np.float32)
+    for index, value in hashed_features(text, RETRIEVAL_FEATURES, STOPWORDS).items():
+        vector[index] = value
+    return vector
+
+def retrieve_for_goal(user_id, goal, message, k=3):
+    """
+    Return the goal's items most relevant to a message as {collection: [(item, score), ...]},
+    or None without NumPy. Completed and abandoned plans are left out.
+    """
+    if not HAS_NUMPY or not message:
+        return None
+
+    with _goal_indexes_lock:
+        indexes = _goal_indexes.get(user_id)
+        if indexes is None:
+            indexes = {"lock": threading.Lock(), "goals": {}}
+            _goal_indexes[user_id] = indexes
+
+    query = embed(message)
+    results = {}
+    with indexes["lock"]:
+        goal_indexes = indexes["goals"].setdefault(goal["id"], {collection: ListIndex(ITEM_TEXT[collection])
+                                                                for collection in GOAL_COLLECTIONS})
+        for collection in GOAL_COLLECTIONS:
+            items = goal.get(collection, [])
+            goal_indexes[collection].sync(items)
+            results[collection] = goal_indexes[collection].search(items, query, k, _weight(collection))
+    return results
+
+def rank_solutions(solutions, message, k=3, allowed_ids=None):
+    """
+    Return up to k solutions from the solution database most relevant to a message, best first,
+    optionally only those whose ID is in allowed_ids; None without NumPy
+    """
+    global _solutions_db_index
+
+    if not HAS_NUMPY or not message:
+        return None
+
+    with _solutions_db_lock:
+        if _solutions_db_index is None:
+            _solutions_db_index = ListIndex(ITEM_TEXT["solutions"])
+        _solutions_db_index.sync(solutions)
+        query = embed(message)
+        if allowed_ids is None:
+            results = _solutions_db_index.search(solutions, query, k, _weight("solutions"))
+        else:
+            # Solutions already picked out some other way are only ordered, however loosely they match
+            rows = np.array([row for row, solution in enumerate(solutions) if solution["id"] in allowed_ids], dtype=np.int64)
+            results = _solutions_db_index.search(solutions, query, k, _weight("solutions"), rows, min_similarity=-1.0)
+
+    return [solution for solution, _ in results]
+
+def _weight(collection):
+    """Weight for relevant items: newer ones count more, and solutions by how well they worked"""
+    def weight(item, row, count):
+        recency = (row + 1) / count
+        if collection == "plans" and item.get("status") != "active":
+            return 0.0
+        if collection == "solutions":
+            return 0.5 + 0.25 * effectiveness_score(item) + 0.25 * recency
+        return 0.75 + 0.25 * recency
+    return weight
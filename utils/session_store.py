@@ -0,0 +1,104 @@
+# session_store.py
+# In-process per-user state (such as the last assistant reply) with a cap on the number
+# of users kept, least recently used first out, and idle users dropped after SESSION_IDLE_TTL, so
+# memory stays flat however many distinct user IDs the service sees.
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+# Most users whose state is kept, and seconds a user's state is kept after their last request
+SESSION_MAX_USERS = int(os.getenv("SESSION_MAX_USERS", "10000"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", str(6 * 3600)))
+
+class SessionStore:
+    """Thread-safe map of user ID to state with LRU and idle-TTL eviction"""
+
+    def __init__(self, max_users=None, idle_ttl=None):
+        self.max_users = max_users or SESSION_MAX_USERS
+        self.idle_ttl = idle_ttl or SESSION_IDLE_TTL
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._evicted = {"lru": 0, "idle": 0}
+
+    def get(self, user_id, default=None):
+        with self._lock:
+            self._evict_idle()
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return default
+            self._touch(user_id, entry)
+            return entry[1]
+
+    def set(self, user_id, value):
+        with self._lock:
+            self._evict_idle()
+            self._entries[user_id] = [time.monotonic(), value]
+            self._entries.move_to_end(user_id)
+            self._evict_lru()
+
+    def pop(self, user_id, default=None):
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+            return default if entry is None else entry[1]
+
+    def __getitem__(self, user_id):
+        value = self.get(user_id, _MISSING)
+        if value is _MISSING:
+            raise KeyError(user_id)
+        return value
+
+    def __setitem__(self, user_id, value):
+        self.set(user_id, value)
+
+    def __contains__(self, user_id):
+        return self.get(user_id, _MISSING) is not _MISSING
+
+    def __len__(self):
+        with self._lock:
+            self._evict_idle()
+            return len(self._entries)
+
+    def stats(self):
+        """Return the number of users kept, evictions so far and an estimate of the memory held"""
+        with self._lock:
+            self._evict_idle()
+            return {
+                "users": len(self._entries),
+                "max_users": self.max_users,
+                "evicted_lru": self._evicted["lru"],
+                "evicted_idle": self._evicted["idle"],
+                "approx_bytes": sum(_approx_size(user_id) + _approx_size(entry[1])
+                                    for user_id, entry in self._entries.items())
+            }
+
+    def _touch(self, user_id, entry):
+        entry[0] = time.monotonic()
+        self._entries.move_to_end(user_id)
+
+    def _evict_idle(self):
+        # Entries are in last-use order, so idle ones are all at the front
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._entries:
+            user_id, entry = next(iter(self._entries.items()))
+            if entry[0] >= cutoff:
+                break
+            del self._entries[user_id]
+            self._evicted["idle"] += 1
+
+    def _evict_lru(self):
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+            self._evicted["lru"] += 1
+
+_MISSING = object()
+
+def _approx_size(value):
+    """Rough deep size of strings, numbers and the dicts and lists holding them"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_approx_size(k) + _approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_approx_size(item) for item in value)
+    return size
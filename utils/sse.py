@@ -0,0 +1,6 @@
+# sse.py
+import json
+
+def format_sse(event, data):
+    """Format one Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -1,8 +1,10 @@
 # stage_classifier.py
-import os
-from openai import OpenAI
+import asyncio
+from utils.openai_client import get_client, get_async_client
+from utils.llm_cache import cached_completion_hit, cached_completion_hit_async
+from utils.local_stage_classifier import confident_stage, record_label
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = get_client()
 
 # Classification constants
 PRECONTEMPLATION = "precontemplation"
@@ -55,22 +57,48 @@ Respond ONLY with the class number and name, nothing else.
 Example: "CLASS 2: Contemplation"
 """
 
+def _classifier_request(message):
+    """Build the stage classification request"""
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": CLASSIFIER_SYSTEM_PROMPT},
+            {"role": "user", "content": message}
+        ]
+    }
+
 def classify_stage(message):
     """Determine the user's current stage of change"""
-    messages = [
-        {"role": "system", "content": CLASSIFIER_SYSTEM_PROMPT},
-        {"role": "user", "content": message}
-    ]
+    # The local model answers when it is confident; otherwise ask the LLM
+    stage = confident_stage(message)
+    if stage is not None:
+        return stage
+    
+    classification, cached = cached_completion_hit(client, _classifier_request(message))
+    classification = classification.strip()
     
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-    )
+    stage = parse_stage_classification(classification)
+    # A cached classification was logged when it was first made
+    if classification.startswith("CLASS") and not cached:
+        record_label(message, stage)
+    return stage
+
+async def classify_stage_async(message):
+    """Async version of classify_stage"""
+    stage = confident_stage(message)
+    if stage is not None:
+        return stage
     
-    # Extract stage classification
-    classification = response.choices[0].message.content.strip()
+    classification, cached = await cached_completion_hit_async(get_async_client(), _classifier_request(message))
+    classification = classification.strip()
     
-    # Parse the classification
+    stage = parse_stage_classification(classification)
+    if classification.startswith("CLASS") and not cached:
+        await asyncio.to_thread(record_label, message, stage)
+    return stage
+
+def parse_stage_classification(classification):
+    """Map a "CLASS n: Name" classification to one of the stage constants"""
     if "CLASS 1:" in classification:
         return PRECONTEMPLATION
     elif "CLASS 2:" in classification:
@@ -0,0 +1,35 @@
+# text_features.py
+# Feature hashing for the local text models: word unigrams and bigrams are hashed into a fixed
+# number of buckets, so a model needs no vocabulary and any message can be featurized.
+import re
+import math
+import zlib
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+def tokenize(text):
+    """Lowercase a message and split it into words"""
+    return WORD_PATTERN.findall(text.lower())
+
+def hashed_features(text, dim, stopwords=None):
+    """
+    Return a message's features as a dictionary of bucket index to weight
+    Counts of unigrams and bigrams are hashed into dim buckets and scaled to unit length.
+    Words in stopwords are left out.
+    """
+    words = tokenize(text)
+    if stopwords:
+        words = [word for word in words if word not in stopwords]
+    terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    features = {}
+    for term in terms:
+        # crc32 is stable across processes, unlike hash()
+        index = zlib.crc32(term.encode("utf-8")) % dim
+        features[index] = features.get(index, 0.0) + 1.0
+
+    norm = math.sqrt(sum(value * value for value in features.values()))
+    if norm:
+        for index in features:
+            features[index] /= norm
+    return features
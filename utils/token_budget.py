@@ -0,0 +1,84 @@
+# token_budget.py
+# Builds prompts to a token budget: the system prompt and context are always sent, and the
+# conversation history fills the rest newest message first. Tokens are counted with tiktoken when
+# it is installed and otherwise estimated from the text length. The apps call load_tokenizer at
+# startup, since tiktoken fetches its encoding data on first use.
+import os
+import threading
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Tokens a prompt may use, counting the system prompt, context messages and history
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+
+# Tokens the chat format adds to each message for its role and separators
+MESSAGE_OVERHEAD = 4
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+def _get_encoding():
+    """Load the gpt-4o-mini tokenizer once; None if tiktoken is missing or its data can't be fetched"""
+    global _encoding, _encoding_loaded
+
+    with _encoding_lock:
+        if not _encoding_loaded:
+            _encoding_loaded = True
+            if tiktoken is not None:
+                try:
+                    _encoding = tiktoken.encoding_for_model("gpt-4o-mini")
+                except Exception as e:
+                    print(f"Error loading tokenizer, estimating token counts instead: {str(e)}")
+        return _encoding
+
+def load_tokenizer():
+    """
+    Load the tokenizer at startup, so no request waits while tiktoken downloads its data
+    Returns whether tiktoken is in use. Offline hosts need the data prefetched into TIKTOKEN_CACHE_DIR.
+    """
+    return _get_encoding() is not None
+
+@lru_cache(maxsize=16384)
+def count_tokens(text):
+    """Count the tokens in a text; results are cached, so each message is only counted once"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+
+    # About four characters per token in English text
+    return (len(text) + 3) // 4
+
+def message_tokens(message):
+    return MESSAGE_OVERHEAD + count_tokens(message["content"])
+
+def fit_history(history, budget):
+    """Return the newest messages of history that fit in budget tokens, oldest first; the newest is always kept"""
+    kept = []
+    used = 0
+    for message in reversed(history):
+        tokens = message_tokens(message)
+        if kept and used + tokens > budget:
+            break
+        kept.append(message)
+        used += tokens
+
+    kept.reverse()
+    return kept, used
+
+def build_prompt(system_messages, history, context_messages=(), budget=None):
+    """
+    Lay out a prompt as system messages, history, then context messages, trimming the history
+    so the whole prompt stays within budget tokens (PROMPT_TOKEN_BUDGET by default)
+    Returns (messages, token_count).
+    """
+    budget = PROMPT_TOKEN_BUDGET if budget is None else budget
+    fixed = list(system_messages) + list(context_messages)
+    fixed_tokens = sum(message_tokens(message) for message in fixed)
+
+    kept, history_tokens = fit_history(history, budget - fixed_tokens)
+    return list(system_messages) + kept + list(context_messages), fixed_tokens + history_tokens
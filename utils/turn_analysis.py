@@ -0,0 +1,161 @@
+# turn_analysis.py
+import json
+import asyncio
+from utils.openai_client import get_client, get_async_client
+from utils.llm_cache import cached_completion_hit, cached_completion_hit_async
+
+import utils.stage_classifier as stage_classifier
+from utils.extractors import parse_plan_result, parse_motivation_result, parse_solution_result
+from utils.local_stage_classifier import record_label
+
+client = get_client()
+
+TURN_ANALYSIS_SYSTEM_PROMPT = """
+You analyze one message from a user working on a habit goal with a behavior change coach. Fill in every field of the JSON response.
+
+"stage" - the user's stage of change (Transtheoretical Model):
+- precontemplation: denies or minimizes the problem, blames others, feels external pressure, no intent to change
+- contemplation: ambivalent, "I should, but...", recognizes the problem but has no concrete plans
+- preparation: planning a first small step, "How do I start...?", "I plan to... tomorrow", setting dates or gathering resources
+- action: already doing the behavior, reporting recent experiments, progress or challenges while persisting
+- maintenance: sustained the habit for 6+ months, focuses on preventing relapse, habit is part of routine or identity
+
+"motivation" - the user's key motivations in one concise sentence: values, goals, hoped-for benefits, or barriers holding them back. null if none is expressed.
+
+"plan" - a specific plan for behavior change: what they will do ("action"), when or in what context ("timeline"), and how hard it is likely to be ("difficulty": easy, medium or hard). If the user agrees to suggestions from the assistant's previous message (e.g. "sounds good", "I'll try that"), extract the first plan suggested there. null if there is no plan.
+
+"solution" - something the user tried that worked for them, even if briefly stated: a short "name", a detailed "description", and "effectiveness" (high, medium, low; medium if not mentioned). null if there is no solution.
+
+"goal_switch" - if a list of the user's goals is given and the user asks to switch to one of them, that goal's name exactly as listed. Otherwise null.
+"""
+
+_PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string"},
+        "timeline": {"type": "string"},
+        "difficulty": {"type": "string", "enum": ["easy", "medium", "hard"]}
+    },
+    "required": ["action", "timeline", "difficulty"],
+    "additionalProperties": False
+}
+
+_SOLUTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "description": {"type": "string"},
+        "effectiveness": {"type": "string", "enum": ["high", "medium", "low"]}
+    },
+    "required": ["name", "description", "effectiveness"],
+    "additionalProperties": False
+}
+
+TURN_ANALYSIS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "turn_analysis",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "stage": {
+                    "type": "string",
+                    "enum": [
+                        stage_classifier.PRECONTEMPLATION,
+                        stage_classifier.CONTEMPLATION,
+                        stage_classifier.PREPARATION,
+                        stage_classifier.ACTION,
+                        stage_classifier.MAINTENANCE
+                    ]
+                },
+                "motivation": {"type": ["string", "null"]},
+                "plan": {"anyOf": [_PLAN_SCHEMA, {"type": "null"}]},
+                "solution": {"anyOf": [_SOLUTION_SCHEMA, {"type": "null"}]},
+                "goal_switch": {"type": ["string", "null"]}
+            },
+            "required": ["stage", "motivation", "plan", "solution", "goal_switch"],
+            "additionalProperties": False
+        }
+    }
+}
+
+def _turn_analysis_request(user_message, previous_assistant_message=None, goals=None):
+    """Build the combined turn analysis request"""
+    content = f"User's message: {user_message}"
+    if previous_assistant_message:
+        content += f"\n\nAssistant's previous message: {previous_assistant_message}"
+
+    # Goal switching only makes sense when there is more than one goal
+    if goals and len(goals) > 1:
+        content += f"\n\nThe user's goals: {', '.join([g['name'] for g in goals])}"
+
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": TURN_ANALYSIS_SYSTEM_PROMPT},
+            {"role": "user", "content": content}
+        ],
+        "response_format": TURN_ANALYSIS_RESPONSE_FORMAT
+    }
+
+def parse_turn_analysis(content, goals=None):
+    """Normalize a combined turn analysis response into the shapes the individual helpers return"""
+    result = json.loads(content)
+
+    return {
+        "stage": result.get("stage") or stage_classifier.CONTEMPLATION,
+        "motivation": parse_motivation_result(result.get("motivation")),
+        "plan": parse_plan_result(result.get("plan")),
+        "solution": parse_solution_result(result.get("solution")),
+        "goal_switch": match_goal_switch(result.get("goal_switch"), goals)
+    }
+
+def analyze_turn(user_message, previous_assistant_message=None, goals=None):
+    """
+    Use a single OpenAI call to classify the stage and extract motivation, plan, solution and goal switch
+    Returns a dictionary with "stage", "motivation", "plan", "solution" and "goal_switch" in the same
+    shapes the individual classifier, extractors and goal-switch check return, or None if the call failed
+    """
+    try:
+        content, cached = cached_completion_hit(
+            client, _turn_analysis_request(user_message, previous_assistant_message, goals)
+        )
+        analysis = parse_turn_analysis(content, goals)
+        
+        # The stage is labelled by the LLM here too, so it is training data for the local classifier
+        # (a cached analysis was logged when it was first made)
+        if not cached:
+            record_label(user_message, analysis["stage"])
+        return analysis
+
+    except Exception as e:
+        print(f"Error analyzing turn: {str(e)}")
+        return None
+
+async def analyze_turn_async(user_message, previous_assistant_message=None, goals=None):
+    """Async version of analyze_turn"""
+    try:
+        content, cached = await cached_completion_hit_async(
+            get_async_client(), _turn_analysis_request(user_message, previous_assistant_message, goals)
+        )
+        analysis = parse_turn_analysis(content, goals)
+        
+        if not cached:
+            await asyncio.to_thread(record_label, user_message, analysis["stage"])
+        return analysis
+
+    except Exception as e:
+        print(f"Error analyzing turn: {str(e)}")
+        return None
+
+def match_goal_switch(goal_name, goals):
+    """Find the ID of the goal named in a goal-switch result"""
+    if not goal_name or not goals or len(goals) <= 1:
+        return None
+
+    for goal in goals:
+        if goal["name"].lower() in goal_name.lower():
+            return goal["id"]
+
+    return None